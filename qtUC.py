@@ -279,6 +279,10 @@ class qtUC(QMainWindow):
 
         # setup the gui update queue
         self.gui_queue = queue.Queue(maxsize=0)
+        self.audioLevel = 0                         # latest meter value, only one update queued at a time
+        self.audioPeak = 0                          # latest held peak, same scale
+        self.meterClip = False                      # needle shown red for a peak near full scale
+        self.levelQueued = False
         self.guiUpdate = qtUC_GuiUpdate(self.gui_queue)
         self.guiUpdate.signals.signal_process.connect(self.process_gui_queue)
         self.guiUpdate.start()
@@ -291,7 +295,8 @@ class qtUC(QMainWindow):
     # UI update queue processing
     def process_gui_queue(self, mtype, mdata):
         if mtype == 'audiolevel':
-            self.setAudioLevel(mdata[mtype])
+            self.levelQueued = False                # clear before reading so a newer level is never lost
+            self.setAudioLevel(self.audioLevel, self.audioPeak)
         elif mtype == 'lastheard':
             self.setLastHeard(mdata[mtype])
         elif mtype == 'status':
@@ -518,7 +523,11 @@ class qtUC(QMainWindow):
         # ensure coms is in sync
         coms.updateServerInfo(tgrpVal, tgName)
 
-    def setAudioLevel(self, level):
+    def setAudioLevel(self, level, peak=0):
+        clip = peak >= cfg.meter_offset - 1         # held peak within 1 dB of full scale
+        if clip != self.meterClip:
+            self.meterClip = clip
+            self.ui.wgMeter.set_NeedleColor(*((255, 0, 0, 255) if clip else (50, 50, 50, 255)))
         self.ui.wgMeter.update_value(level)
 
     def setup_mode(self, mode):
@@ -634,13 +643,13 @@ class qtUC(QMainWindow):
                 # defs.STRING_MODE,
                 defs.STRING_NAME,
                 defs.STRING_TG,
-                # defs.STRING_LOSS,
+                defs.STRING_LOSS,
                 defs.STRING_DURATION,
                 # ''
                 ]
         # widths = [100, 70, 55, 125, 50, 60]     # , 30]
-        widths = [100, 70, 125, 125, 60]     # , 30]
-        self.ui.tblLastHeard.setColumnCount(5)
+        widths = [100, 70, 125, 125, 50, 60]     # , 30]
+        self.ui.tblLastHeard.setColumnCount(len(cols))
         # self.ui.tblLastHeard.setHorizontalHeaderLabels(['Calltime', 'Call', 'Mode', 'Talkgroup', 'Loss', 'Duration'])
         # self.ui.tblLastHeard.setHorizontalHeaderLabels(['Calltime', 'Call', 'Name', 'Talkgroup', 'Duration'])
         self.ui.tblLastHeard.setHorizontalHeaderLabels(cols)
@@ -957,7 +966,7 @@ def logEndRxCall(call, name, mode, slot, tg, callmode, loss, start_time):
             # mode,   # + ' ' + str(slot),
             name,
             tgname,    # tg,
-            # loss,
+            loss,
             '{:.2f}s'.format(time() - start_time)
             ]
     calldata = (info, duration)
@@ -967,7 +976,7 @@ def logEndRxCall(call, name, mode, slot, tg, callmode, loss, start_time):
 def logEndTxCall(mode, tg, slot, start_time, duration):
     #  callinfo = [call, name, mode, slot, tg, callmode, loss, start_time]
     call = cfg.my_call
-    loss = '0.0%'               # ?? not being sent from dvswitch?
+    loss = ''                   # no rx accounting for our own transmissions
 
     callstart = strftime('%b %d %H:%M', localtime(start_time))
 
@@ -978,15 +987,20 @@ def logEndTxCall(mode, tg, slot, start_time, duration):
             'Me',
             # slot,
             tg,
-            # loss,
+            loss,
             '{:.2f}s'.format(duration)
             ]
     calldata = (info, duration)
     app.gui_queue.put({'lastheard': calldata})
 
 
-def txrxLevel(level):
-    app.gui_queue.put({'audiolevel': level})
+def txrxLevel(level, peak=0):
+    # latest value wins - the meter does not need every level queued
+    app.audioLevel = level
+    app.audioPeak = peak
+    if not app.levelQueued:
+        app.levelQueued = True
+        app.gui_queue.put({'audiolevel': None})
 
 
 def serverState():
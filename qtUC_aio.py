@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC asyncio USRP transport
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from qtUC_vars import qtUCVars as var  # configuration variables
+from qtUC_audio import callbackOutput
+import qtUC_util as ut
+
+PLAY_QUEUE = 4                                      # frames waiting for the audio worker before dropping
+
+
+class usrpProtocol(asyncio.DatagramProtocol):
+    # Hands received datagrams to the rx packet processing
+    def __init__(self, rx):
+        self.rx = rx
+
+    def datagram_received(self, data, addr):
+        try:
+            self.rx.rxAudioStream(data, addr)
+        except Exception as e:
+            ut.log.warning('usrp rx: ' + str(e))
+
+    def error_received(self, exc):
+        ut.log.warning('usrp transport: ' + str(exc))
+
+
+class aioComs(threading.Thread):
+    # One event loop thread replacing the rx and keepalive threads.
+    # USRP rx, ping, registration retries and INFO polling all run on the
+    # loop, blocking audio output is bridged through a single worker executor.
+    def __init__(self, coms):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.coms = coms
+        self.loop = asyncio.new_event_loop()
+        self.transport = None
+        self.executor = None                        # blocking audio writes
+        self.pending = 0                            # frames queued on the executor
+        self.dropped = 0                            # frames dropped with the executor queue full
+        self.pendingLock = threading.Lock()
+        self.restore = None                         # rx.playAudio before the executor bridge
+        self.timers = []
+        self.ready = threading.Event()
+
+    def shutdown(self):
+        ut.log.debug('aio - stopping event loop')
+        self.loop.call_soon_threadsafe(self.stopLoop)
+
+    def stopLoop(self):
+        for timer in self.timers:
+            timer.cancel()
+        if self.transport is not None:
+            self.transport.abort()                  # closes our dup, the qtComs socket stays open
+        self.loop.stop()
+
+    def run(self):
+        ut.log.info('Starting asyncio network thread')
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.setup())
+        except Exception as e:                      # includes shutdown() before setup completed
+            ut.log.error('aio setup failed: ' + str(e))
+            if self.transport is not None:
+                self.transport.abort()
+            self.transport = None                   # tells qtComs to fall back to the rx thread
+            self.release()
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+        self.release()
+        if self.dropped:
+            ut.log.info('aio audio frames dropped: {}'.format(self.dropped))
+
+    def release(self):
+        # hand audio output back to rx, it may carry on without the loop
+        if self.restore is not None:
+            self.coms.rxa.playAudio = self.restore
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    async def setup(self):
+        rx = self.coms.rxa
+        if rx.connected and rx.jitter is None and not isinstance(rx.stream, callbackOutput):
+            # a blocking stream.write must not stall the loop, keep the writes ordered on one worker
+            self.executor = ThreadPoolExecutor(max_workers=1)
+            self.restore = rx.playAudio
+            rx.playAudio = self.queueAudio
+
+        # the transport gets its own descriptor, closing it leaves the qtComs socket open.
+        # O_NONBLOCK is shared with the original, qtComs makes it blocking again if it needs to.
+        self.transport, _ = await self.loop.create_datagram_endpoint(lambda: usrpProtocol(rx), sock=self.coms.udp.dup())
+
+        if var.NAT_ping_timer > 0:
+            self.every(var.NAT_ping_timer, self.coms.ping)
+        if var.reg_retry > 0:
+            self.every(var.reg_retry, self.coms.retryRegistration)
+        if var.info_poll > 0:
+            self.every(var.info_poll, self.coms.pollInfo)
+
+    def queueAudio(self, audio):
+        # hand a frame to the audio worker, dropping it if the output has fallen behind
+        with self.pendingLock:
+            if self.pending >= PLAY_QUEUE:
+                self.dropped += 1
+                return
+            self.pending += 1
+        self.executor.submit(self.restore, bytes(audio)).add_done_callback(self.played)
+
+    def played(self, future):
+        with self.pendingLock:
+            self.pending -= 1
+
+    # -- timers -- #
+    def every(self, interval, func):
+        # call func every interval seconds on the loop
+        def tick():
+            try:
+                func()
+            except Exception as e:
+                ut.log.warning('aio timer: ' + str(e))
+            self.timers[idx] = self.loop.call_later(interval, tick)
+
+        idx = len(self.timers)
+        self.timers.append(self.loop.call_later(interval, tick))
+
+    def callLater(self, delay, func, *args):
+        # thread safe one shot timer
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay, func, *args)
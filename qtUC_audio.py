@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC audio device helpers
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import threading
+import pyaudio
+import numpy as np
+import qtUC_util as ut
+
+
+class ringBuffer():
+    # Single producer / single consumer byte ring buffer.
+    # No lock is taken: the producer only advances wpos and the consumer only
+    # advances rpos, each after its copy is complete, and a python int
+    # assignment is atomic. Positions are running byte totals.
+    def __init__(self, size):
+        self.size = size
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.wpos = 0
+        self.rpos = 0
+        self.playing = False                        # consumer has been getting data
+
+        # stats
+        self.overruns = 0                           # writes (partly) dropped, buffer full
+        self.underruns = 0                          # reads short of data while playing
+
+    def available(self):
+        return self.wpos - self.rpos
+
+    def free(self):
+        return self.size - (self.wpos - self.rpos)
+
+    def clear(self):
+        # consumer side reset
+        self.rpos = self.wpos
+        self.playing = False
+
+    def write(self, data):
+        # producer: copy in as much as fits, the remainder is dropped
+        n = len(data)
+        free = self.free()
+        if n > free:
+            self.overruns += 1
+            n = free
+        if n <= 0:
+            return 0
+
+        start = self.wpos % self.size
+        first = min(n, self.size - start)
+        self.view[start:start + first] = data[:first]
+        if first < n:
+            self.view[:n - first] = data[first:n]
+        self.wpos += n
+        return n
+
+    def read(self, n):
+        # consumer: n bytes, padded with silence if short
+        avail = self.available()
+        if avail <= 0:
+            if self.playing:
+                self.underruns += 1
+                self.playing = False
+            return bytes(n)
+
+        take = min(n, avail)
+        start = self.rpos % self.size
+        first = min(take, self.size - start)
+        out = bytearray(n)
+        out[:first] = self.view[start:start + first]
+        if first < take:
+            out[first:take] = self.view[:take - first]
+        self.rpos += take
+
+        if take < n and self.playing:
+            self.underruns += 1
+        self.playing = take == n
+        return bytes(out)
+
+
+class callbackOutput():
+    # Non blocking output, the device pulls audio from a ring buffer through
+    # the PyAudio callback so a busy device never blocks the writer
+    def __init__(self, pya, channels, rate, chunk, deviceIndex, bufferTime=0.2):
+        self.frameSize = 2 * channels               # 16 bit samples
+        self.ring = ringBuffer(int(rate * bufferTime) * self.frameSize)
+        self.deviceUnderflows = 0                   # reported by portaudio
+        self.stream = pya.open(format=pyaudio.paInt16,
+                               channels=channels,
+                               rate=rate,
+                               output=True,
+                               frames_per_buffer=chunk,
+                               output_device_index=deviceIndex,
+                               stream_callback=self.callback
+                               )
+
+    def callback(self, in_data, frame_count, time_info, status):
+        if status & pyaudio.paOutputUnderflow:
+            self.deviceUnderflows += 1
+        return (self.ring.read(frame_count * self.frameSize), pyaudio.paContinue)
+
+    def write(self, data, frames=None):
+        # same call signature as a blocking pyaudio stream
+        self.ring.write(data)
+
+    def stats(self):
+        return {'underruns': self.ring.underruns,
+                'overruns': self.ring.overruns,
+                'device_underflows': self.deviceUnderflows}
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+
+
+class callbackInput():
+    # Non blocking capture, the device pushes audio into a ring buffer through
+    # the PyAudio callback and read() pulls whole frames from it, so capture
+    # timing doesn't depend on when the reader gets scheduled
+    def __init__(self, pya, channels, rate, chunk, deviceIndex, bufferTime=0.2):
+        self.frameSize = 2 * channels               # 16 bit samples
+        self.ring = ringBuffer(int(rate * bufferTime) * self.frameSize)
+        self.ready = threading.Event()              # set by the callback after each write
+        self.active = True                          # standby() discards captured audio
+        self.deviceOverflows = 0                    # reported by portaudio
+        self.stream = pya.open(format=pyaudio.paInt16,
+                               channels=channels,
+                               rate=rate,
+                               input=True,
+                               frames_per_buffer=chunk,
+                               input_device_index=deviceIndex,
+                               stream_callback=self.callback
+                               )
+
+    def callback(self, in_data, frame_count, time_info, status):
+        if status & pyaudio.paInputOverflow:
+            self.deviceOverflows += 1
+        if self.active:
+            self.ring.write(in_data)
+            self.ready.set()
+        return (None, pyaudio.paContinue)
+
+    def read(self, frames, exception_on_overflow=True, timeout=1.0):
+        # same call signature as a blocking pyaudio stream, waits for a whole
+        # frame (padded with silence if the device stops delivering)
+        n = frames * self.frameSize
+        while self.ring.available() < n:
+            self.ready.clear()
+            if self.ring.available() >= n or not self.ready.wait(timeout):
+                break
+        return self.ring.read(n)
+
+    def standby(self):
+        # reader is idle (ptt off), stop buffering
+        self.active = False
+
+    def resume(self):
+        # drop anything stale, the next read starts with fresh audio
+        self.ring.clear()
+        self.active = True
+
+    def stats(self):
+        return {'overruns': self.ring.overruns,
+                'device_overflows': self.deviceOverflows}
+
+    def stop_stream(self):
+        self.stream.stop_stream()
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+
+
+def parseChannelMap(text, channels):
+    # '0,1' > [0, 1], '' or a bad entry > every channel, out of range entries are dropped
+    if not text.strip():
+        return list(range(channels))
+    try:
+        chans = [int(c) for c in text.replace(' ', '').split(',') if c != '']
+    except ValueError:
+        ut.log.warning('Bad channel map "{}", using all channels'.format(text))
+        return list(range(channels))
+    return [c for c in chans if 0 <= c < channels] or list(range(channels))
+
+
+class channelFanout():
+    # Copies mono 16 bit audio to the mapped channels of an interleaved
+    # frame for any channel count, unmapped channels stay silent.
+    # The output is a read only view of a buffer reused for every frame.
+    def __init__(self, channels, channelMap=None, frames=960):
+        self.channels = channels
+        self.map = channelMap if channelMap else list(range(channels))
+        self.allocate(frames)
+
+    def allocate(self, frames):
+        self.buf = np.zeros((frames, self.channels), dtype='<i2')
+        self.view = memoryview(self.buf).cast('B').toreadonly()
+
+    def process(self, audio):
+        x = np.frombuffer(audio, dtype='<i2')
+        n = len(x)
+        if n > len(self.buf):
+            self.allocate(n)
+        self.buf[:n, self.map] = x[:, None]
+        return self.view[:n * self.channels * 2]
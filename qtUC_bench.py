@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC micro benchmarks
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# usage: python qtUC_bench.py [--json results.json] [--baseline base.json] [--save base.json]
+# --------------------------------------------------------------------------- #
+import sys
+import json
+import threading
+import struct
+import argparse
+from time import perf_counter, process_time
+import numpy as np
+import qtUC_const as const
+from qtUC_usrp import usrpDecoder, usrpEncoder
+from qtUC_resample import polyResampler
+
+try:
+    import audioop                                  # gone in python 3.13
+except ImportError:
+    audioop = None
+
+BENCH_PACKETS = 200000
+BENCH_FRAMES = 2000
+BENCH_CALLS = 20000                                 # per call benchmarks (rx/tx paths)
+BENCH_REPEAT = 3                                    # best of n runs
+TOLERANCE = 0.15                                    # allowed slow down against the baseline
+
+
+def voicePacket(seq, keyup=1):
+    # a 320 byte (20 ms @ 8K) voice packet as sent by AB
+    return (b'USRP' + struct.pack('>iiiiiii', seq, 0, keyup, 0, const.USRP_TYPE_VOICE, 0, 0)
+            + bytes(range(256)) + bytes(64))
+
+
+def legacyDecode(soundData):
+    # header decode as originally done in qtUcRx.rxAudioStream
+    if (soundData[0:4] == b'USRP'):
+        eye = soundData[0:4]
+        seq, = struct.unpack(">i", soundData[4:8])
+        memory, = struct.unpack(">i", soundData[8:12])
+        keyup, = struct.unpack(">i", soundData[12:16])
+        talkgroup, = struct.unpack(">i", soundData[16:20])
+        typestr, = struct.unpack("i", soundData[20:24])
+        mpxid, = struct.unpack(">i", soundData[24:28])
+        reserved, = struct.unpack(">i", soundData[28:32])
+        audio = soundData[32:]
+        return seq, keyup, typestr, audio
+
+
+def legacyEncode(seq, keyup, ptype, payload):
+    # packet build as originally done in qtUcTx.run and qtComs.sendUSRPCommand
+    return 'USRP'.encode('ASCII') + struct.pack('>iiiiiii', seq, 0, keyup, 0, ptype << 24, 0, 0) + payload
+
+
+def benchHeaderDecode(count=BENCH_PACKETS):
+    # packets/sec for the old slice + unpack decode and the reused buffer decoder
+    pkt = voicePacket(1234)
+    results = {}
+
+    start = perf_counter()
+    for _ in range(count):
+        legacyDecode(pkt)
+    results['legacy'] = {'pps': count / (perf_counter() - start)}
+
+    dec = usrpDecoder()
+    start = perf_counter()
+    for _ in range(count):
+        dec.load(pkt)                               # stands in for recvfrom_into
+        if dec.decode():
+            dec.payload()
+    results['decoder'] = {'pps': count / (perf_counter() - start)}
+    return results
+
+
+def tone(freq, rate, seconds=1.0, level=10000):
+    n = int(rate * seconds)
+    return (level * np.sin(2 * np.pi * freq * np.arange(n) / rate)).astype('<i2')
+
+
+def frames(samples, rate):
+    # split into 20ms frames of bytes
+    n = rate // 50
+    return [samples[i:i + n].tobytes() for i in range(0, len(samples) - n + 1, n)]
+
+
+def ratecvConverter(inRate, outRate):
+    state = [None]
+
+    def convert(audio):
+        out, state[0] = audioop.ratecv(audio, 2, 1, inRate, outRate, state[0])
+        return out
+    return convert
+
+
+def converters(inRate, outRate):
+    conv = {'poly': polyResampler(inRate, outRate).convert}
+    if audioop is not None:
+        conv['ratecv'] = ratecvConverter(inRate, outRate)
+    return conv
+
+
+def imageDb(out, rate, cutoff):
+    # energy above cutoff relative to the total energy of the converted signal, dB
+    y = np.frombuffer(out, dtype='<i2').astype(float)[rate // 10:]          # skip filter start up
+    spec = np.abs(np.fft.rfft(y * np.hanning(len(y)))) ** 2
+    freqs = np.fft.rfftfreq(len(y), 1.0 / rate)
+    return 10 * np.log10(max(spec[freqs > cutoff].sum(), 1e-12) / spec.sum())
+
+
+def aliasDb(out, rate, inLevel):
+    # level of the converted signal relative to an input that should be fully rejected, dB
+    y = np.frombuffer(out, dtype='<i2').astype(float)[rate // 10:]
+    return 20 * np.log10(max(np.sqrt(np.mean(y ** 2)), 0.5) / (inLevel / np.sqrt(2)))     # floor at 1/2 lsb
+
+
+def benchResampler(count=BENCH_FRAMES):
+    # CPU per 20ms frame and aliasing/imaging for the rx (8K>48K) and tx (48K>8K) conversions
+    results = {}
+
+    # rx: a 1K tone upsampled, images land above 4K
+    fr = frames(tone(1000, 8000), 8000)
+    for name, conv in converters(8000, 48000).items():
+        start = process_time()
+        for i in range(count):
+            conv(fr[i % len(fr)])
+        cpu = (process_time() - start) / count
+        conv = converters(8000, 48000)[name]                # fresh state for the quality run
+        out = b''.join(conv(f) for f in fr)
+        results['8k>48k ' + name] = {'us_per_frame': cpu * 1e6, 'image_db': imageDb(out, 48000, 4200)}
+
+    # tx: a 5K tone (above the 8K nyquist) downsampled, anything left is aliased
+    fr = frames(tone(5000, 48000), 48000)
+    for name, conv in converters(48000, 8000).items():
+        start = process_time()
+        for i in range(count):
+            conv(fr[i % len(fr)])
+        cpu = (process_time() - start) / count
+        conv = converters(48000, 8000)[name]                # fresh state for the quality run
+        out = b''.join(conv(f) for f in fr)
+        results['48k>8k ' + name] = {'us_per_frame': cpu * 1e6, 'alias_db': aliasDb(out, 8000, 10000)}
+    return results
+
+
+def usPerCall(func, count=BENCH_CALLS):
+    # best of BENCH_REPEAT runs, microseconds per call
+    best = None
+    for _ in range(BENCH_REPEAT):
+        start = perf_counter()
+        for _ in range(count):
+            func()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return 1e6 * best / count
+
+
+def setupAudio(rate):
+    # configuration for an rx/tx object on the null audio device
+    from qtUC_vars import qtUCVars as cfg
+    cfg.out_index = 0
+    cfg.in_index = 0
+    cfg.SAMPLE_RATE = rate
+    cfg.audio_callback = False
+    cfg.jitter_buffer = False
+    cfg.record_calls = False
+    cfg.capture_file = ''
+
+
+def benchRx(count=BENCH_CALLS):
+    # rxAudioStream (header decode + processAudio + output) at 8K and 48K, text parsing
+    from qtUC_capture import nullAudio
+    results = {}
+    speech = tone(1000, 8000, 0.02).tobytes()
+    for rate in (8000, 48000):
+        setupAudio(rate)
+        from qtUC_rx import qtUcRx
+        rx = qtUcRx(None, nullAudio())
+        pkt = bytearray(voicePacket(0)[:32] + speech)
+        seq = [0]
+
+        def voice():
+            seq[0] += 1                             # new seq each time, duplicates are dropped
+            struct.pack_into('>i', pkt, 4, seq[0])
+            rx.rxAudioStream(pkt)
+        results['rxAudioStream {}k'.format(rate // 1000)] = {'us_per_call': usPerCall(voice, count)}
+
+    # TLV_TAG_SET_INFO call details (json call/name)
+    call = b'{"call":"N0CALL","name":"Test User"}\x00'
+    rx.audio = bytes([const.TLV_TAG_SET_INFO, 12 + len(call), 0x2f, 0x1b, 0x3c, 0, 0, 0, 0, 0, 0, 91, 2, 0]) + call
+
+    def setInfo():
+        rx.rxCall = False
+        rx.processTLVText()
+    results['processTLVText'] = {'us_per_call': usPerCall(setInfo, count)}
+
+    # INFO: json from AB
+    info = {'tlv': {'ambe_mode': 'DMR', 'ambe_size': 72},
+            'last_tune': '91',
+            'digital': {'gw': '1234567', 'rpt': '123456701', 'tg': '91', 'ts': '2', 'cc': '1', 'call': 'N0CALL'}}
+    rx.audio = b'INFO:' + json.dumps(info).encode('ASCII') + b'\x00'
+    results['processInfo'] = {'us_per_call': usPerCall(rx.processInfo, count)}
+    return results
+
+
+def benchTx(count=BENCH_CALLS):
+    # voice packet build in qtUcTx.run and qtComs.sendUSRPCommand
+    from qtUC_capture import nullAudio
+    from qtUC_coms import qtComs
+    setupAudio(8000)
+    from qtUC_tx import qtUcTx
+    results = {}
+    speech = tone(1000, 8000, 0.02).tobytes()
+
+    # packet build alone, new bytes per packet against the reused encoder
+    results['usrp encode legacy'] = {'us_per_call': usPerCall(
+        lambda: legacyEncode(1234, 1, const.USRP_TYPE_VOICE, speech), count)}
+    enc = usrpEncoder()
+    results['usrp encode'] = {'us_per_call': usPerCall(
+        lambda: enc.encode(1234, 1, const.USRP_TYPE_VOICE, speech), count)}
+
+    tx = qtUcTx(nullAudio())
+    tx.ptt = True
+    for name in ('pcm', 'ulaw', 'adpcm'):
+        tx.codec.select(name)
+        results['tx voicePacket ' + name] = {'us_per_call': usPerCall(lambda: tx.voicePacket(speech), count)}
+    results['tx dsp chain'] = {'us_per_call': usPerCall(lambda: tx.dsp.process(speech), count)}
+
+    coms = qtComs.__new__(qtComs)                   # no sockets or audio, just the packet path
+    coms.usrpSeq = 0
+    coms.cmdFrame = usrpEncoder()
+    coms.cmdLock = threading.Lock()
+    coms.sendto = lambda usrp: None
+    cmd = bytes('INFO:', 'ASCII')
+    results['sendUSRPCommand'] = {'us_per_call': usPerCall(lambda: coms.sendUSRPCommand(cmd, const.USRP_TYPE_TEXT), count)}
+    return results
+
+
+def runAll():
+    import qtUC_util as ut
+    ut.log.setLevel('WARNING')                      # keep per call logging out of the timings
+    results = {}
+    for suite in (benchHeaderDecode, benchResampler, benchRx, benchTx):
+        results.update(suite())
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # regressions against a baseline: pps lower or us_* higher by more than tolerance
+    regressions = []
+    for name, metrics in baseline.items():
+        for key, base in metrics.items():
+            now = results.get(name, {}).get(key)
+            if now is None or not base:
+                continue
+            if key == 'pps':
+                change = base / now - 1
+            elif key.startswith('us_'):
+                change = now / base - 1
+            else:
+                continue                            # quality figures are reported, not gated
+            if change > tolerance:
+                regressions.append('{} {}: {:.1f} -> {:.1f} ({:+.0%} worse)'.format(name, key, base, now, change))
+    return regressions
+
+
+def report(results):
+    for name, metrics in results.items():
+        print('  {:<24} '.format(name) + '  '.join('{} {:>12,.1f}'.format(k, v) for k, v in metrics.items()))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='qtUC hot path benchmarks')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare against this results file')
+    parser.add_argument('--save', help='store the results as a new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed slow down (0.15 = 15%%)')
+    args = parser.parse_args(argv)
+
+    results = runAll()
+    report(results)
+    for path in (args.json, args.save):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC USRP capture and replay
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# usage: python qtUC_capture.py capture <file> [--port 50100] [--seconds n]
+#        python qtUC_capture.py replay <file> [--speed n] [--udp host:port] [--rate 48000]
+#        python qtUC_capture.py info <file>
+# --------------------------------------------------------------------------- #
+import sys
+import socket
+import struct
+import argparse
+from time import perf_counter, process_time, sleep
+import numpy as np
+
+# File layout: CAPTURE_MAGIC then one record per datagram
+#   time (float64 seconds since capture start), source ipv4, source port, length, datagram
+CAPTURE_MAGIC = b'QTUCCAP1'
+CAPTURE_RECORD = struct.Struct('<d4sHH')
+CAPTURE_BUFFER = 1 << 16
+
+
+class captureWriter():
+    # Appends received datagrams to a capture file (buffered, no per packet syscall)
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb', buffering=CAPTURE_BUFFER)
+        self.file.write(CAPTURE_MAGIC)
+        self.start = perf_counter()
+        self.packets = 0
+
+    def write(self, data, addr):
+        try:
+            ip = socket.inet_aton(addr[0])
+            port = addr[1]
+        except (OSError, TypeError, IndexError):    # not ipv4 (or no source)
+            ip = bytes(4)
+            port = 0
+        self.file.write(CAPTURE_RECORD.pack(perf_counter() - self.start, ip, port, len(data)))
+        self.file.write(data)
+        self.packets += 1
+
+    def close(self):
+        self.file.close()
+
+
+def readCapture(path):
+    # yields (time, (ip, port), datagram)
+    with open(path, 'rb') as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(path + ' is not a qtUC capture file')
+        while True:
+            head = f.read(CAPTURE_RECORD.size)
+            if len(head) < CAPTURE_RECORD.size:
+                return
+            ts, ip, port, length = CAPTURE_RECORD.unpack(head)
+            yield ts, (socket.inet_ntoa(ip), port), f.read(length)
+
+
+# -- null audio device for replays and benchmarks -- #
+class nullStream():
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data, frames=None):
+        self.bytes += len(data)
+
+    def read(self, frames, exception_on_overflow=True):
+        return bytes(2 * frames)
+
+    def stop_stream(self):
+        return
+
+    def close(self):
+        return
+
+
+class nullAudio():
+    # stands in for pyaudio.PyAudio, one output device that discards everything
+    def __init__(self, channels=2):
+        self.channels = channels
+        self.stream = nullStream()
+
+    def get_device_info_by_host_api_device_index(self, api, index):
+        return {'name': 'null', 'maxOutputChannels': self.channels, 'maxInputChannels': 1}
+
+    def open(self, *args, **kwargs):
+        return self.stream
+
+
+# -- replay -- #
+def paced(records, speed):
+    # yields records at speed x real time, speed 0 = as fast as possible
+    start = perf_counter()
+    first = None
+    for rec in records:
+        if speed > 0:
+            if first is None:
+                first = rec[0]
+            delay = (rec[0] - first) / speed - (perf_counter() - start)
+            if delay > 0:
+                sleep(delay)
+        yield rec
+
+
+def replayRx(path, speed=0, rate=48000):
+    # feed a capture through qtUcRx (header decode, dispatch, decode, resample) into a null sink
+    from qtUC_vars import qtUCVars as cfg
+    cfg.out_index = 0
+    cfg.SAMPLE_RATE = rate
+    cfg.audio_callback = False
+    cfg.jitter_buffer = False
+    cfg.record_calls = False
+    cfg.capture_file = ''                           # never re-capture a replay
+    from qtUC_rx import qtUcRx
+
+    rx = qtUcRx(None, nullAudio())
+    latency = []
+    wall = perf_counter()
+    cpu = process_time()
+    for ts, addr, data in paced(readCapture(path), speed):
+        start = perf_counter()
+        rx.rxAudioStream(data, addr)
+        latency.append(perf_counter() - start)
+    return results(latency, perf_counter() - wall, process_time() - cpu, rx.dispatcher.summary())
+
+
+def replayUdp(path, dest, speed=1):
+    # send a capture to a live qtUC (or anything else) on dest
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    latency = []
+    wall = perf_counter()
+    cpu = process_time()
+    for ts, addr, data in paced(readCapture(path), speed):
+        start = perf_counter()
+        udp.sendto(data, dest)
+        latency.append(perf_counter() - start)
+    udp.close()
+    return results(latency, perf_counter() - wall, process_time() - cpu)
+
+
+def results(latency, wall, cpu, detail=''):
+    lat = np.array(latency) * 1e6 if latency else np.zeros(1)
+    return {'packets': len(latency),
+            'seconds': wall,
+            'pps': len(latency) / wall if wall > 0 else 0.0,
+            'cpu_percent': 100 * cpu / wall if wall > 0 else 0.0,
+            'latency_us': {'p50': float(np.percentile(lat, 50)),
+                           'p90': float(np.percentile(lat, 90)),
+                           'p99': float(np.percentile(lat, 99)),
+                           'max': float(lat.max())},
+            'detail': detail}
+
+
+def captureUdp(path, port, seconds=0):
+    # record what arrives on port without running qtUC
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp.bind(('', port))
+    udp.settimeout(0.5)
+    buf = bytearray(2048)
+    cap = captureWriter(path)
+    start = perf_counter()
+    try:
+        while seconds <= 0 or perf_counter() - start < seconds:
+            try:
+                n, addr = udp.recvfrom_into(buf)
+            except socket.timeout:
+                continue
+            cap.write(memoryview(buf)[:n], addr)
+    except KeyboardInterrupt:
+        pass
+    cap.close()
+    return cap.packets
+
+
+def info(path):
+    packets = 0
+    size = 0
+    last = 0.0
+    sources = {}
+    for ts, addr, data in readCapture(path):
+        packets += 1
+        size += len(data)
+        last = ts
+        sources[addr] = sources.get(addr, 0) + 1
+    return {'packets': packets, 'bytes': size, 'seconds': last, 'sources': sources}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='qtUC USRP capture and replay')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('capture', help='record USRP datagrams from a UDP port')
+    p.add_argument('file')
+    p.add_argument('--port', type=int, default=50100)
+    p.add_argument('--seconds', type=float, default=0, help='0 = until ctrl-c')
+    p = sub.add_parser('replay', help='replay a capture into qtUcRx or a UDP port')
+    p.add_argument('file')
+    p.add_argument('--speed', type=float, default=0, help='1 = real time, n = n times, 0 = as fast as possible')
+    p.add_argument('--udp', help='host:port to send to instead of qtUcRx')
+    p.add_argument('--rate', type=int, default=48000, help='output device rate for qtUcRx')
+    p = sub.add_parser('info', help='summarise a capture')
+    p.add_argument('file')
+    args = parser.parse_args(argv)
+
+    if args.cmd == 'capture':
+        print('{} packets captured'.format(captureUdp(args.file, args.port, args.seconds)))
+    elif args.cmd == 'info':
+        print(info(args.file))
+    elif args.udp:
+        host, port = args.udp.rsplit(':', 1)
+        print(replayUdp(args.file, (host, int(port)), args.speed))
+    else:
+        print(replayRx(args.file, args.speed, args.rate))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC USRP voice payload codecs
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import numpy as np
+import qtUC_const as const
+
+# -- G.711 u-law -- #
+ULAW_BIAS = 0x84
+ULAW_CLIP = 8159                                    # 14 bit magnitude clip
+ULAW_SEGMENTS = [0x3f, 0x7f, 0xff, 0x1ff, 0x3ff, 0x7ff, 0xfff, 0x1fff]   # segment end points (14 bit)
+
+
+def _ulawDecodeTable():
+    # all 256 codes > linear
+    u = ~np.arange(256, dtype=np.int32) & 0xff
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0f
+    mag = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return np.where(u & 0x80, -mag, mag).astype(np.int16)
+
+
+def _ulawEncodeTable():
+    # every 16 bit sample > code, indexed by the sample as uint16.
+    # Works on the 14 bit magnitude as the CCITT reference (and audioop) does.
+    x = np.arange(65536, dtype=np.int32)
+    x = np.where(x >= 32768, x - 65536, x) >> 2
+    mask = np.where(x < 0, 0x7f, 0xff)
+    mag = np.minimum(np.abs(x), ULAW_CLIP) + (ULAW_BIAS >> 2)
+    segment = np.searchsorted(ULAW_SEGMENTS, mag)                       # 0..8
+    code = np.where(segment < 8, (segment << 4) | ((mag >> (segment + 1)) & 0x0f), 0x7f)
+    return (code ^ mask).astype(np.uint8)
+
+
+ULAW_DECODE = _ulawDecodeTable()
+ULAW_ENCODE = _ulawEncodeTable()
+
+
+def ulawDecode(data):
+    # u-law bytes > 16 bit pcm bytes
+    return ULAW_DECODE[np.frombuffer(data, dtype=np.uint8)].astype('<i2').tobytes()
+
+
+def ulawEncode(audio):
+    # 16 bit pcm bytes > u-law bytes
+    return ULAW_ENCODE[np.frombuffer(audio, dtype='<i2').view(np.uint16)].tobytes()
+
+
+# -- IMA (DVI) ADPCM, 4 bits per sample, first sample in the high nibble -- #
+ADPCM_INDEX = [-1, -1, -1, -1, 2, 4, 6, 8]
+ADPCM_STEP = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767]
+
+
+def _adpcmTables():
+    # per (step index, code): the signed predictor delta and the next step index
+    delta = np.zeros((len(ADPCM_STEP), 16), dtype=np.int32)
+    nextIndex = np.zeros((len(ADPCM_STEP), 16), dtype=np.int32)
+    for idx, step in enumerate(ADPCM_STEP):
+        for code in range(16):
+            d = step >> 3
+            if code & 4:
+                d += step
+            if code & 2:
+                d += step >> 1
+            if code & 1:
+                d += step >> 2
+            delta[idx, code] = -d if code & 8 else d
+            nextIndex[idx, code] = min(max(idx + ADPCM_INDEX[code & 7], 0), len(ADPCM_STEP) - 1)
+    return delta, nextIndex
+
+
+ADPCM_DELTA, ADPCM_NEXT = _adpcmTables()
+_DELTA = ADPCM_DELTA.tolist()                       # python lists for the per sample loops
+_NEXT = ADPCM_NEXT.tolist()
+
+
+class adpcmCodec():
+    # IMA ADPCM with the predictor and step index carried from frame to frame.
+    # Encode and decode each keep their own state, reset them at call start.
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.encPred = 0
+        self.encIndex = 0
+        self.decPred = 0
+        self.decIndex = 0
+
+    def decode(self, data):
+        # adpcm bytes > 16 bit pcm bytes (two samples per byte)
+        packed = np.frombuffer(data, dtype=np.uint8)
+        codes = np.empty(2 * len(packed), dtype=np.int32)
+        codes[0::2] = packed >> 4
+        codes[1::2] = packed & 0x0f
+
+        # the step index sequence only depends on the codes, the deltas then come
+        # from one table gather and the predictor is a running sum
+        idx = self.decIndex
+        indexes = []
+        for code in codes.tolist():
+            indexes.append(idx)
+            idx = _NEXT[idx][code]
+        self.decIndex = idx
+
+        deltas = ADPCM_DELTA[indexes, codes]
+        pred = self.decPred + np.cumsum(deltas)
+        if pred.size and (pred.max() > 32767 or pred.min() < -32768):
+            pred = self.clampedSum(deltas)          # clipping changes every later sample
+        if pred.size:
+            self.decPred = int(pred[-1])
+        return pred.astype('<i2').tobytes()
+
+    def clampedSum(self, deltas):
+        out = np.empty(len(deltas), dtype=np.int32)
+        pred = self.decPred
+        for i, d in enumerate(deltas.tolist()):
+            pred = min(max(pred + d, -32768), 32767)
+            out[i] = pred
+        return out
+
+    def encode(self, audio):
+        # 16 bit pcm bytes > adpcm bytes, the encoder tracks the decoder predictor
+        pred = self.encPred
+        idx = self.encIndex
+        codes = []
+        for sample in np.frombuffer(audio, dtype='<i2').tolist():
+            step = ADPCM_STEP[idx]
+            diff = sample - pred
+            code = 0
+            if diff < 0:
+                code = 8
+                diff = -diff
+            if diff >= step:
+                code |= 4
+                diff -= step
+            if diff >= step >> 1:
+                code |= 2
+                diff -= step >> 1
+            if diff >= step >> 2:
+                code |= 1
+            pred = min(max(pred + _DELTA[idx][code], -32768), 32767)
+            idx = _NEXT[idx][code]
+            codes.append(code)
+        self.encPred = pred
+        self.encIndex = idx
+
+        codes = np.array(codes, dtype=np.uint8)
+        if len(codes) & 1:
+            codes = np.append(codes, np.uint8(0))
+        return ((codes[0::2] << 4) | codes[1::2]).tobytes()
+
+
+# -- USRP voice formats -- #
+VOICE_TYPES = {'pcm': const.USRP_TYPE_VOICE,
+               'ulaw': const.USRP_TYPE_VOICE_ULAW,
+               'adpcm': const.USRP_TYPE_VOICE_ADPCM}
+VOICE_NAMES = {ptype: name for name, ptype in VOICE_TYPES.items()}
+
+
+class voiceCodec():
+    # Converts 20ms 8K pcm frames to and from the selected USRP voice payload
+    def __init__(self, name='pcm'):
+        self.adpcm = adpcmCodec()
+        self.select(name)
+
+    def select(self, name):
+        name = name.lower()
+        if name not in VOICE_TYPES:
+            raise ValueError('Unknown voice codec ' + name)
+        self.name = name
+        self.type = VOICE_TYPES[name]
+
+    def reset(self):
+        self.adpcm.reset()
+
+    def encode(self, audio):
+        if self.type == const.USRP_TYPE_VOICE_ULAW:
+            return ulawEncode(audio)
+        if self.type == const.USRP_TYPE_VOICE_ADPCM:
+            return self.adpcm.encode(audio)
+        return audio
+
+    def decode(self, ptype, data):
+        if ptype == const.USRP_TYPE_VOICE_ULAW:
+            return ulawDecode(data)
+        if ptype == const.USRP_TYPE_VOICE_ADPCM:
+            return self.adpcm.decode(data)
+        return data
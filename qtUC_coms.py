@@ -30,6 +30,9 @@ import traceback
 import pyaudio
 from qtUC_rx import qtUcRx
 from qtUC_tx import qtUcTx
+from qtUC_aio import aioComs
+from qtUC_usrp import usrpEncoder
+from qtUC_net import txFanout
 import qtUC_const as const
 import qtUC_defs as defs
 from qtUC_vars import qtUCVars as var  # configuration variables
@@ -96,8 +99,13 @@ class qtComs():
         self.txa = None                             # Tx audio
         self.rxa = None                             # Rx audio
         self.keepalive = None
+        self.aio = None                             # asyncio network core (optional)
         self.udp = None                             # UDP socket for USRP traffic
+        self.fanout = None                          # tx to every AB port
+        self.fanoutLock = threading.Lock()          # rebuilt from whichever thread sends first after a change
         self.usrpSeq = 0                            # Each USRP packet has a unique sequence number
+        self.cmdFrame = usrpEncoder()               # reused command packet buffer
+        self.cmdLock = threading.Lock()             # commands are sent from the ui, keepalive and aio threads
 
         # runtime
         self.txEnable = False                       # allow TX audio
@@ -144,10 +152,15 @@ class qtComs():
         if self.regState:                           # If we were registered, tell AB we are done
             self.unregisterWithAB()
             sleep(1)                                # wait a moment to unregister
+        if self.aio is not None:
+            self.aio.shutdown()
         if self.txa is not None:
             self.txa.shutdown()                     # tx audio stream
 
         self.rxa.shutdown()                         # rx audio stream
+        if self.fanout is not None:
+            ut.log.info('tx sends: ' + self.fanout.summary())
+            self.fanout.close()
 
         # self.udp.shutdown(socket.SHUT_RDWR)
         # self.udp.close()
@@ -175,7 +188,18 @@ class qtComs():
         self.init_rx()
         self.init_tx()
 
-        if var.NAT_ping_timer > 0:
+        if var.async_net:                           # rx, ping and polling on one event loop
+            self.aio = aioComs(self)
+            self.aio.start()
+            if not self.aio.ready.wait(5) or self.aio.transport is None:
+                # setup failed or is stuck, run the rx and keepalive threads instead
+                ut.log.warning('aio unavailable, using the rx thread')
+                self.aio.shutdown()                 # stops a loop that is still starting
+                self.aio.join(5)                    # only one reader on the socket
+                self.aio = None
+                self.udp.setblocking(True)          # the loop left the socket non-blocking
+                self.rxa.start()
+        if self.aio is None and var.NAT_ping_timer > 0:
             ut.log.debug('Initialising keepalive')
             self.keepalive = keepalive()
             self.keepalive.start()
@@ -212,7 +236,10 @@ class qtComs():
         self.rxa.onRxLevel = self.txRxLevel
         self.rxa.onRxStart = self.rxCallStart
         self.rxa.onRxEnd = self.logRxCall
-        self.rxa.start()
+        if var.async_net:
+            self.rxa.startPlayout()                 # datagrams are delivered by the event loop
+        else:
+            self.rxa.start()
 
     # Open the UDP socket for TX and RX
     def openUdpStream(self):
@@ -222,6 +249,7 @@ class qtComs():
             self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         except Exception:
             ut.log.warning(defs.STRING_WINDOWS_PORT_REUSE)
+        self.fanout = self.openFanout()
         # wake up the daemons...
         self.sendUSRPCommand(bytes("PING", 'ASCII'), const.USRP_TYPE_PING)
 
@@ -232,15 +260,28 @@ class qtComs():
         msg = 'UDP stream opened on ' + str(var.usrp_tx_port)
         ut.log.debug(msg)
 
+    def openFanout(self):
+        # tx ports resolved once, connected sockets if rx has a port of its own
+        return txFanout(self.udp, var.ip_address, var.usrp_tx_port,
+                        var.tx_connect and var.usrp_rx_port not in var.usrp_tx_port)
+
+    def checkFanout(self):
+        # the server address and ports can be changed in settings at any time
+        with self.fanoutLock:
+            if not self.fanout.matches(var.ip_address, var.usrp_tx_port):
+                ut.log.info('tx destination changed to {} {}'.format(var.ip_address, var.usrp_tx_port))
+                old = self.fanout
+                self.fanout = self.openFanout()     # swap first, other threads may still be sending on the old one
+                old.close()
+
     def sendto(self, usrp):
-        # -- Basic send to udp port --#
-        try:
-            for port in var.usrp_tx_port:
-                # print('sending ' + str(usrp) + ' to ' + var.ip_address + ', ' + str(port))
-                self.udp.sendto(usrp, (var.ip_address, port))
-        except Exception as e:
-            ut.log.error(str(e))
-            self.regState = False
+        # -- Send to every AB tx port --#
+        if not self.fanout.matches(var.ip_address, var.usrp_tx_port):
+            self.checkFanout()
+        fanout = self.fanout
+        if not fanout.send(usrp) and self.regState:
+            ut.log.error('Every tx destination is failing: ' + fanout.summary())
+            self.regState = False                   # AB is not there
 
     # -- helpers -- #
     def getCurrentTG(self):
@@ -254,8 +295,8 @@ class qtComs():
         # print('rx ', noteType, msg)
         self.onNotifyMsg(noteType, msg)
 
-    def txRxLevel(self, level):
-        self.onTxRxLevel(level)
+    def txRxLevel(self, level, peak=0):
+        self.onTxRxLevel(level, peak)
 
     # -- Tx Handlers --#
     def setTxEnable(self, allowTx):
@@ -335,6 +376,7 @@ class qtComs():
             self.regState = True
             self.onRegisterStatus(True, var.ip_address)     # connectedvar.connected_msg.set(defs.STRING_REGISTERED)
             self.sendMetadata()
+            self.negotiateCodec()
             self.requestInfo()
             self.setTxEnable(True)
 
@@ -344,8 +386,11 @@ class qtComs():
             self.setTxEnable(False)
             # update tx state
             if (waitTime > 0):
-                sleep(waitTime)
-                self.registerWithAB()                       # try to re-register
+                if self.aio is not None:
+                    self.aio.callLater(waitTime, self.registerWithAB)
+                else:
+                    sleep(waitTime)
+                    self.registerWithAB()                   # try to re-register
 
     def connectServer(self, mode, tg, tslot):
         if not self.regState:
@@ -421,13 +466,10 @@ class qtComs():
         ut.log.debug("sendUSRPCommand: " + str(cmd))
         try:
             # Send "text" packet to AB.
-            usrp = 'USRP'.encode('ASCII') + (struct.pack('>iiiiiii',
-                                             self.usrpSeq,
-                                             0, 0, 0,
-                                             packetType << 24,
-                                             0, 0)) + cmd
-            self.usrpSeq = (self.usrpSeq + 1) & 0xffff
-            self.sendto(usrp)
+            with self.cmdLock:                      # the packet buffer is shared
+                usrp = self.cmdFrame.encode(self.usrpSeq, 0, packetType, cmd)
+                self.usrpSeq = (self.usrpSeq + 1) & 0xffff
+                self.sendto(usrp)
         except Exception:
             ut.log.critical('barf...')
             traceback.print_exc()
@@ -453,6 +495,25 @@ class qtComs():
     def requestInfo(self):
         self.sendUSRPCommand(bytes("INFO:", 'ASCII'), const.USRP_TYPE_TEXT)
 
+    # -- timed (asyncio) housekeeping -- #
+    def ping(self):
+        self.sendUSRPCommand(bytes("PING", 'ASCII'), const.USRP_TYPE_PING)
+
+    def retryRegistration(self):
+        if not self.regState and var.asl_mode == 0:
+            ut.log.debug('registration retry')
+            self.registerWithAB()
+
+    def pollInfo(self):
+        if self.regState:
+            self.requestInfo()
+
+    def negotiateCodec(self):
+        # ask AB to send voice in the same (compressed) format we transmit, rx decodes any format
+        if var.voice_codec != 'pcm':
+            ut.log.info('Requesting ' + var.voice_codec + ' voice from AB')
+            self.sendRemoteControlCommandASCII('usrpCodec=' + var.voice_codec.upper())
+
     def sendMetadata(self):
         dmr_id = self.dmrid
         call = bytes(self.mycall, 'ASCII') + bytes(chr(0), 'ASCII')
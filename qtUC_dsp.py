@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC audio processing stages
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+from math import cos, exp, log10, pi, sin
+from time import thread_time
+import numpy as np
+import qtUC_util as ut
+
+FRAME_RATE = 50                                     # 20ms USRP frames per second
+FULL_SCALE = 32768.0
+
+
+def toSamples(audio):
+    # 16 bit little endian pcm (bytes, bytearray or memoryview) as an int16 array, no copy
+    return np.frombuffer(audio, dtype='<i2')
+
+
+def dbfs(value):
+    return 20 * log10(value / FULL_SCALE) if value > 0 else -120.0
+
+
+class levelMeter():
+    # Accumulates RMS and sample peak over frames and publishes at a fixed
+    # rate instead of every frame. onLevel gets the RMS level and the held
+    # peak, both in dBFS + offset (the meter scale). The level has an instant
+    # attack and decays, the peak is held for holdTime then decays.
+    def __init__(self, publishRate=25, offset=50.0, holdTime=0.5, decay=20.0):
+        self.framesPerPublish = max(1, int(round(FRAME_RATE / publishRate)))
+        self.offset = offset                        # dB added to dBFS for the meter scale
+        self.holdFrames = int(holdTime * FRAME_RATE)
+        self.decay = decay / FRAME_RATE             # dB per frame once the hold expires
+
+        # external handlers
+        self.onLevel = self.nullHandler
+
+        self.reset()
+
+    # Null event handler
+    def nullHandler(self, *args):
+        return
+
+    def reset(self):
+        self.sumSquares = 0.0
+        self.samples = 0
+        self.frames = 0
+        self.peak = 0                               # sample peak since the last publish
+        self.level = 0.0                            # published RMS meter value
+        self.held = 0.0                             # published (held) peak meter value
+        self.holdCount = 0
+
+    def feed(self, audio):
+        x = toSamples(audio).astype(np.float32)
+        self.sumSquares += float(np.dot(x, x))
+        self.samples += len(x)
+        if len(x):
+            self.peak = max(self.peak, int(np.abs(x).max()))
+        self.frames += 1
+        if self.frames >= self.framesPerPublish:
+            self.publish()
+
+    def publish(self):
+        rms = (self.sumSquares / self.samples) ** 0.5 if self.samples else 0.0
+        level = max(0.0, dbfs(rms) + self.offset)
+        peak = max(0.0, dbfs(self.peak) + self.offset)
+        fall = self.decay * self.frames
+
+        self.level = max(level, self.level - fall)  # instant attack, decay
+        if peak >= self.held:                       # instant attack, hold, decay
+            self.held = peak
+            self.holdCount = self.holdFrames
+        elif self.holdCount > 0:
+            self.holdCount -= self.frames
+        else:
+            self.held = max(peak, self.held - fall)
+
+        self.sumSquares = 0.0
+        self.samples = 0
+        self.frames = 0
+        self.peak = 0
+        self.onLevel(int(self.level), int(self.held))
+
+
+class silenceGate():
+    # Detects digital (near) silence per frame, e.g. key up hang time. After
+    # the first silent frame, which still goes through the resampler so its
+    # filter history settles, frames are replaced by precomputed device rate
+    # silence or comfort noise and the resampler is skipped.
+    def __init__(self, threshold, frameBytes, noiseDb=0, frames=8):
+        self.threshold = threshold                  # peak (lsb) at or below which a frame is silent, < 0 = off
+        self.run = 0                                # consecutive silent frames
+        self.elided = 0                             # frames not resampled
+
+        if noiseDb < 0:                             # comfort noise, a few frames cycled
+            level = FULL_SCALE * 10 ** (noiseDb / 20)
+            noise = (np.random.default_rng().standard_normal(frames * frameBytes // 2) * level).astype('<i2').tobytes()
+            self.fillers = [noise[i:i + frameBytes] for i in range(0, len(noise), frameBytes)]
+        else:
+            self.fillers = [bytes(frameBytes)]
+        self.next = 0
+
+    def elide(self, audio):
+        # True if this frame can be replaced by fill()
+        if self.threshold < 0:
+            return False
+        x = toSamples(audio)
+        if len(x) and x.max() <= self.threshold and x.min() >= -self.threshold:
+            self.run += 1
+        else:
+            self.run = 0
+        return self.run > 1
+
+    def fill(self):
+        self.elided += 1
+        self.next = (self.next + 1) % len(self.fillers)
+        return self.fillers[self.next]
+
+
+VOLUME_RANGE = 24.0                                 # dB across the 0..100 volume setting, 50 = unity
+
+
+def volumeGain(volume):
+    # volume setting (0..100) as a linear gain, 0 = mute
+    if volume <= 0:
+        return 0.0
+    return 10 ** ((min(volume, 100) - 50) * VOLUME_RANGE / 100 / 20)
+
+
+class rxAgc():
+    # Normalises received speech towards a target RMS level, one 20ms 8K
+    # frame at a time. The gain follows the frame level with a fast attack
+    # and slow release, is held while the frame is below the noise gate and
+    # is ramped across each frame so changes don't click. The speaker volume
+    # is applied on top and the result limited so the frame peak stays under
+    # the ceiling (hard clipped as a last resort).
+    def __init__(self, target=-18.0, maxGain=20.0, attack=0.02, release=0.5,
+                 ceiling=-1.0, gate=-50.0, enabled=True, frameSamples=160):
+        self.enabled = enabled
+        self.target = FULL_SCALE * 10 ** (target / 20)
+        self.maxGain = 10 ** (maxGain / 20)
+        self.minGain = 1 / self.maxGain
+        self.attack = 1 - exp(-1 / (attack * FRAME_RATE))       # per frame smoothing
+        self.release = 1 - exp(-1 / (release * FRAME_RATE))
+        self.ceiling = FULL_SCALE * 10 ** (ceiling / 20)
+        self.gate = FULL_SCALE * 10 ** (gate / 20)
+        self.ramp = np.arange(1, frameSamples + 1, dtype=np.float32) / frameSamples
+        self.volume = None
+        self.volGain = 1.0
+        self.limited = 0                            # frames reduced by the limiter
+        self.reset()
+
+    def reset(self):
+        # call start, the new station is measured from scratch
+        self.gain = 1.0                             # agc gain
+        self.applied = None                         # total gain at the end of the previous frame
+
+    def setVolume(self, volume):
+        if volume != self.volume:
+            self.volume = volume
+            self.volGain = volumeGain(volume)
+
+    def process(self, audio):
+        # 16 bit 8K frame in, bytes out
+        x = toSamples(audio).astype(np.float32)
+        if not len(x):
+            return audio
+        peak = float(np.abs(x).max())
+
+        if self.enabled:
+            rms = (float(np.dot(x, x)) / len(x)) ** 0.5
+            if rms > self.gate:                     # speech, not noise - adapt
+                want = min(max(self.target / rms, self.minGain), self.maxGain)
+                rate = self.attack if want < self.gain else self.release
+                self.gain += (want - self.gain) * rate
+
+        gain = self.gain * self.volGain
+        if peak * gain > self.ceiling:              # limiter
+            gain = self.ceiling / peak
+            self.limited += 1
+        start = gain if self.applied is None else self.applied
+        self.applied = gain
+        if start == gain == 1.0:
+            return audio                            # unity, nothing to do
+
+        if len(x) == len(self.ramp):
+            x *= start + (gain - start) * self.ramp
+        else:
+            x *= np.linspace(start, gain, len(x) + 1, dtype=np.float32)[1:]
+        return np.clip(x, -32768, 32767).astype('<i2').tobytes()
+
+
+# -- tx processing chain -- #
+# Stages work on float64 8K frames and can be bypassed individually: bypass
+# is toggled by txChain.enable(), off is set by a stage's own settings (e.g.
+# a 0 Hz high pass) and can't be enabled. Level dependent stages work on
+# sub-frame windows and ramp their gain across each window, so there is no
+# per sample python loop anywhere.
+CHAIN_WINDOWS = 4                                   # 5ms windows per 20ms frame
+
+
+def _windows(x):
+    # the frame as (windows, samples) when it splits evenly
+    n = CHAIN_WINDOWS if len(x) % CHAIN_WINDOWS == 0 else 1
+    return x.reshape(n, -1)
+
+
+def _rampGains(prev, gains, size):
+    # per sample gains moving linearly from the previous window's gain to each window's gain
+    ramp = np.arange(1, size + 1) / size
+    starts = np.concatenate(([prev], gains[:-1]))
+    return (starts[:, None] + (gains - starts)[:, None] * ramp).ravel()
+
+
+class highPass():
+    # 2nd order Butterworth high pass (DC, hum and rumble). The recursion is
+    # run a frame at a time as one matrix product: the response of a frame to
+    # each input sample and to the filter state is precomputed per frame size.
+    name = 'hpf'
+
+    def __init__(self, cutoff=150.0, rate=8000):
+        self.bypass = False
+        self.off = cutoff <= 0
+        w0 = 2 * pi * max(cutoff, 1.0) / rate
+        alpha = sin(w0) / (2 * 0.7071)
+        a0 = 1 + alpha
+        self.b = ((1 + cos(w0)) / 2 / a0, -(1 + cos(w0)) / a0, (1 + cos(w0)) / 2 / a0)
+        self.a = (-2 * cos(w0) / a0, (1 - alpha) / a0)
+        n = rate // FRAME_RATE
+        self.matrices = {n: self.matrix(n)}         # frame size: response matrix, 20ms built up front
+        self.reset()
+
+    def reset(self):
+        self.state = np.zeros(4)                    # x[-1], x[-2], y[-1], y[-2]
+
+    def matrix(self, n):
+        # y = M @ [x, state], built by running the recursion on every basis vector at once
+        b0, b1, b2 = self.b
+        a1, a2 = self.a
+        m = n + 4
+        xs = np.zeros((n + 2, m))
+        xs[2:, :n] = np.eye(n)
+        xs[1, n] = 1
+        xs[0, n + 1] = 1
+        ys = np.zeros((n + 2, m))
+        ys[1, n + 2] = 1
+        ys[0, n + 3] = 1
+        for i in range(n):
+            ys[i + 2] = b0 * xs[i + 2] + b1 * xs[i + 1] + b2 * xs[i] - a1 * ys[i + 1] - a2 * ys[i]
+        return ys[2:]
+
+    def process(self, x):
+        n = len(x)
+        if n < 2:
+            return x
+        m = self.matrices.get(n)
+        if m is None:
+            m = self.matrices[n] = self.matrix(n)
+        y = m @ np.concatenate((x, self.state))
+        self.state = np.array((x[-1], x[-2], y[-1], y[-2]))
+        return y
+
+
+class gainStage():
+    # fixed gain from a 0..100 volume setting (50 = unity)
+    name = 'gain'
+
+    def __init__(self, volume=50):
+        self.bypass = False
+        self.off = False
+        self.volume = None
+        self.setVolume(volume)
+
+    def setVolume(self, volume):
+        if volume != self.volume:
+            self.volume = volume
+            self.gain = volumeGain(volume)
+
+    def reset(self):
+        return
+
+    def process(self, x):
+        return x * self.gain if self.gain != 1.0 else x
+
+
+class compressor():
+    # Feed forward RMS compressor with attack/release smoothing per window.
+    # Half the maximum gain reduction is made up so speech sits near the
+    # same loudness with a much smaller range.
+    name = 'comp'
+
+    def __init__(self, threshold=-24.0, ratio=3.0, attack=0.005, release=0.15):
+        self.bypass = False
+        self.off = ratio <= 1
+        self.threshold = threshold
+        self.slope = 1 - 1 / max(ratio, 1.0)
+        self.makeup = 10 ** (-threshold * self.slope / 2 / 20)
+        window = 1 / (FRAME_RATE * CHAIN_WINDOWS)
+        self.attack = 1 - exp(-window / attack)
+        self.release = 1 - exp(-window / release)
+        self.reset()
+
+    def reset(self):
+        self.reduction = 0.0                        # current gain reduction (dB, <= 0)
+        self.last = 1.0                             # gain at the end of the previous frame
+
+    def process(self, x):
+        w = _windows(x)
+        rms = np.sqrt(np.einsum('ij,ij->i', w, w) / w.shape[1])
+        level = 20 * np.log10(np.maximum(rms, 1.0) / FULL_SCALE)
+        want = np.minimum(0.0, (self.threshold - level) * self.slope)     # static curve, dB
+        gains = np.empty(len(want))
+        red = self.reduction
+        for i, target in enumerate(want.tolist()):                        # one step per window
+            red += (target - red) * (self.attack if target < red else self.release)
+            gains[i] = red
+        self.reduction = red
+        gains = 10 ** (gains / 20) * self.makeup
+        g = _rampGains(self.last, gains, w.shape[1])
+        self.last = gains[-1]
+        return x * g
+
+
+class limiter():
+    # Brickwall peak limiter: window peaks set the gain (instant attack,
+    # smooth release) and anything the ramp lets through is clipped at the ceiling.
+    name = 'limit'
+
+    def __init__(self, ceiling=-1.0, release=0.05):
+        self.bypass = False
+        self.off = False
+        self.ceiling = FULL_SCALE * 10 ** (ceiling / 20)
+        self.release = 1 - exp(-1 / (FRAME_RATE * CHAIN_WINDOWS * release))
+        self.limited = 0                            # frames that needed limiting
+        self.reset()
+
+    def reset(self):
+        self.gain = 1.0
+
+    def process(self, x):
+        w = _windows(x)
+        peaks = np.abs(w).max(axis=1)
+        if self.gain >= 1.0 and peaks.max() <= self.ceiling:
+            return x                                # nothing to do
+        need = np.minimum(1.0, self.ceiling / np.maximum(peaks, 1.0))
+        gains = np.empty(len(need))
+        g = self.gain
+        for i, n in enumerate(need.tolist()):
+            g = n if n < g else g + (1.0 - g) * self.release
+            gains[i] = min(g, n)
+        self.limited += 1
+        y = x * _rampGains(self.gain, gains, w.shape[1])
+        self.gain = gains[-1]
+        return np.clip(y, -self.ceiling, self.ceiling)
+
+
+class txChain():
+    # Runs the enabled stages over each 8K frame and keeps CPU time per frame
+    # against a budget, frames over budget are counted and reported. Every
+    # configured stage stays in the chain, enable() only sets their bypass.
+    def __init__(self, stages, budget=0.002):
+        self.stages = stages
+        self.byName = {stage.name: stage for stage in stages}
+        self.budget = budget                        # cpu seconds per 20ms frame
+        self.frames = 0
+        self.cpu = 0.0
+        self.worst = 0.0
+        self.overBudget = 0
+        self.warned = False
+        self.names = None                           # enable() setting in use
+
+    def enable(self, names):
+        # comma separated stage names to run, every other stage is bypassed
+        if names == self.names:
+            return
+        self.names = names
+        wanted = [n.strip().lower() for n in names.split(',')]
+        for stage in self.stages:
+            stage.bypass = stage.name not in wanted
+
+    def reset(self):
+        # start of an over
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, audio):
+        # 16 bit 8K frame in, bytes out
+        active = [stage for stage in self.stages if not (stage.bypass or stage.off)]
+        if not active:
+            return audio
+        start = thread_time()
+        x = toSamples(audio).astype(np.float64)
+        for stage in active:
+            x = stage.process(x)
+        out = np.clip(np.rint(x), -32768, 32767).astype('<i2').tobytes()
+
+        cpu = thread_time() - start
+        self.frames += 1
+        self.cpu += cpu
+        self.worst = max(self.worst, cpu)
+        if cpu > self.budget:
+            self.overBudget += 1
+            if not self.warned and self.overBudget >= FRAME_RATE:
+                self.warned = True
+                ut.log.warning('tx dsp over its {:.1f}ms budget on {} frames'.format(self.budget * 1000, self.overBudget))
+        return out
+
+    def summary(self):
+        avg = 1e6 * self.cpu / self.frames if self.frames else 0.0
+        return 'stages {} frames {} avg {:.0f}us worst {:.0f}us over budget {}'.format(
+            ','.join(s.name for s in self.stages if not (s.bypass or s.off)) or 'none',
+            self.frames, avg, 1e6 * self.worst, self.overBudget)
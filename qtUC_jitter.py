@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC rx jitter buffer
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import threading
+from math import ceil
+from time import perf_counter, sleep
+import numpy as np
+import qtUC_util as ut
+
+FRAME_TIME = 0.020                                  # one USRP voice frame (160 samples @ 8K)
+MAX_CONCEAL = 5                                     # consecutive concealed frames before re-buffering
+TALKSPURT_GAP = 0.5                                 # seconds without voice that start a new talkspurt
+
+
+def seqDiff(a, b):
+    # signed difference a - b of two 32 bit USRP sequence numbers
+    return ((a - b + 0x80000000) & 0xffffffff) - 0x80000000
+
+
+class jitterBuffer():
+    # Reorders voice frames by USRP sequence number and releases them at a
+    # depth adapted to the measured inter-arrival jitter.
+    # put() is called from the rx thread, get() from the playout thread.
+    # end() marks the unkey frame, the over is drained up to it and playout
+    # stops cleanly instead of concealing the silence after it.
+    def __init__(self, minDepth=2, maxDepth=10):
+        self.lock = threading.Lock()
+        self.minDepth = max(1, minDepth)            # frames, 0 would never buffer anything
+        self.maxDepth = max(self.minDepth, maxDepth)
+        self.frames = {}                            # seq: frame
+        self.playSeq = None                         # next sequence to play, None while buffering
+        self.endSeq = None                          # unkey frame of the over being played
+        self.endedAt = None                         # unkey frame of the last over played out
+        self.lastFrame = None                       # last frame played (concealment source)
+        self.concealRun = 0
+
+        # jitter estimate (RFC3550 style, in seconds)
+        self.jitter = 0.0
+        self.lastArrival = None
+        self.lastSeq = None
+        self.depth = self.minDepth                  # current target depth (frames)
+
+        # stats
+        self.received = 0
+        self.late = 0                               # arrived after their play time
+        self.duplicate = 0
+        self.overflow = 0                           # discarded, buffer full
+        self.concealed = 0
+        self.underruns = 0
+
+    def reset(self):
+        with self.lock:
+            self.frames.clear()
+            self.playSeq = None
+            self.endSeq = None
+            self.endedAt = None
+            self.lastFrame = None
+            self.concealRun = 0
+            self.lastArrival = None
+            self.lastSeq = None
+
+    def end(self, seq):
+        # the unkey frame, play out what is queued before it then stop
+        with self.lock:
+            if self.playSeq is None and not self.frames:
+                self.endedAt = seq                  # nothing left of this over
+            else:
+                self.endSeq = seq
+
+    def put(self, seq, frame, arrival=None):
+        # frame must be an owned copy, the rx buffer is reused for the next packet
+        if arrival is None:
+            arrival = perf_counter()
+
+        with self.lock:
+            self.received += 1
+            if self.lastArrival is not None and arrival - self.lastArrival > TALKSPURT_GAP:
+                self.lastArrival = None             # idle between calls is not jitter, start again
+                self.lastSeq = None
+            if self.lastArrival is not None:
+                # transit variation relative to the sender's 20 ms clock
+                d = (arrival - self.lastArrival) - seqDiff(seq, self.lastSeq) * FRAME_TIME
+                d = min(abs(d), self.maxDepth * FRAME_TIME)         # one stall can't max out the depth
+                self.jitter += (d - self.jitter) / 16
+                self.depth = min(self.maxDepth, self.minDepth + ceil(2 * self.jitter / FRAME_TIME))
+            if self.lastSeq is None or seqDiff(seq, self.lastSeq) > 0:
+                self.lastArrival = arrival
+                self.lastSeq = seq
+
+            if self.playSeq is not None and seqDiff(seq, self.playSeq) < 0:
+                self.late += 1                      # too late to be played
+                return
+            if self.playSeq is None and self.endedAt is not None and -self.maxDepth * 2 < seqDiff(seq, self.endedAt) <= 0:
+                self.late += 1                      # straggler from an over already played out
+                return
+            if self.playSeq is None and self.endSeq is not None and seqDiff(seq, self.endSeq) > 0:
+                self.endSeq = None                  # first frame of the next over
+            if seq in self.frames:
+                self.duplicate += 1
+                return
+            if len(self.frames) >= self.maxDepth * 2:
+                self.overflow += 1                  # way behind, drop the oldest
+                del self.frames[min(self.frames, key=lambda s: seqDiff(s, seq))]
+            self.frames[seq] = frame
+
+    def get(self):
+        # next frame for playout, a concealment frame or None when idle/buffering
+        with self.lock:
+            if self.playSeq is None:
+                if not self.frames or (len(self.frames) < self.depth and self.endSeq is None):
+                    return None                     # still filling, a short over plays once it has ended
+                self.playSeq = min(self.frames, key=lambda s: seqDiff(s, self.lastSeq))
+
+            seq = self.playSeq
+            frame = self.frames.pop(seq, None)
+            self.playSeq = (seq + 1) & 0xffffffff
+            if self.endSeq is not None and (seqDiff(seq, self.endSeq) >= 0 or (frame is None and not self.frames)):
+                # end of the over, stop without concealment
+                for s in [s for s in self.frames if seqDiff(s, self.endSeq) <= 0]:
+                    del self.frames[s]
+                self.endedAt = self.endSeq
+                self.endSeq = None
+                self.playSeq = None
+                self.lastFrame = None
+                self.concealRun = 0
+                return frame
+
+            if frame is not None:
+                self.concealRun = 0
+                self.lastFrame = frame
+                return frame
+
+            # missing frame
+            if not self.frames:
+                self.underruns += 1
+            self.concealRun += 1
+            if self.concealRun > MAX_CONCEAL or self.lastFrame is None:
+                # end of stream or a long gap, start buffering again
+                self.playSeq = None
+                self.lastFrame = None
+                self.concealRun = 0
+                return None
+
+            # repeat the last frame, fading it out over the concealment run
+            self.concealed += 1
+            self.lastFrame = (np.frombuffer(self.lastFrame, dtype='<i2') >> 1).tobytes()     # -6dB
+            return self.lastFrame
+
+    def summary(self):
+        return 'depth {} jitter {:.1f}ms received {} late {} dup {} overflow {} concealed {} underruns {}'.format(
+            self.depth, self.jitter * 1000, self.received, self.late, self.duplicate,
+            self.overflow, self.concealed, self.underruns)
+
+
+class jitterPlayout(threading.Thread):
+    # Drains a jitter buffer on a fixed 20 ms clock, decoupling network
+    # receive from the (blocking) audio output
+    def __init__(self, jbuf):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.quit = False
+        self.jbuf = jbuf
+
+        # external handlers
+        self.onFrame = self.nullHandler             # called with each 8K frame to play
+
+    def shutdown(self):
+        self.quit = True
+
+    # Null event handler
+    def nullHandler(self, *args):
+        return
+
+    def run(self):
+        ut.log.info('Starting rx playout thread')
+        due = perf_counter()
+        while not self.quit:
+            try:
+                frame = self.jbuf.get()
+                if frame is not None:
+                    self.onFrame(frame)
+            except Exception as e:
+                ut.log.warning('rx playout: ' + str(e))
+
+            due += FRAME_TIME
+            wait = due - perf_counter()
+            if wait > 0:
+                sleep(wait)
+            elif wait < -(FRAME_TIME * 5):          # fell well behind (device stall), resync the clock
+                due = perf_counter()
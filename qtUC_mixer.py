@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC multi source rx mixer
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import threading
+import numpy as np
+from qtUC_jitter import jitterBuffer
+
+CLIP_KNEE = 0.7                                     # soft clipping starts at this fraction of full scale
+FULL_SCALE = 32767.0
+
+
+def parseSourceGains(text):
+    # 'ip:port=gain, ip=gain' > {'ip:port': gain, 'ip': gain}, bad entries are skipped
+    gains = {}
+    for item in text.split(','):
+        key, sep, value = item.partition('=')
+        try:
+            if sep:
+                gains[key.strip()] = float(value)
+        except ValueError:
+            pass
+    return gains
+
+
+def softClip(x):
+    # linear below the knee, tanh compressed above it, never exceeds full scale
+    knee = CLIP_KNEE * FULL_SCALE
+    mag = np.abs(x)
+    over = mag > knee
+    if over.any():
+        span = FULL_SCALE - knee
+        x = np.where(over, np.sign(x) * (knee + span * np.tanh((mag - knee) / span)), x)
+    return x
+
+
+class rxMixer():
+    # Mixes concurrent rx sources into one 8K stream.
+    # Each source has its own jitter buffer, get() takes one frame from every
+    # source that has one, applies the source gain and sums with soft clipping.
+    # It has the jitterBuffer get() interface so jitterPlayout can drive it.
+    def __init__(self, minDepth=2, maxDepth=10, gain=1.0, sourceGains=None):
+        self.minDepth = minDepth
+        self.maxDepth = maxDepth
+        self.gain = gain                            # default gain for new sources
+        self.sourceGains = sourceGains or {}        # 'ip:port' or 'ip': gain
+        self.sources = {}                           # key: [jitterBuffer, gain]
+        self.lock = threading.Lock()                # sources added by rx, read by playout
+        self.mixed = 0                              # frames with more than one source
+        self.clipped = 0                            # mixed frames that hit the soft clipper
+
+    def put(self, key, seq, frame):
+        # frame must be an owned copy
+        source = self.sources.get(key)
+        if source is None:
+            with self.lock:
+                source = self.sources[key] = [jitterBuffer(self.minDepth, self.maxDepth), self.gainFor(key)]
+        source[0].put(seq, frame)
+
+    def end(self, key, seq):
+        # unkey frame from a source, its buffer drains and stops
+        source = self.sources.get(key)
+        if source is not None:
+            source[0].end(seq)
+
+    def gainFor(self, key):
+        # configured gain for a source address, by ip:port then ip
+        if isinstance(key, tuple) and len(key) == 2:
+            gain = self.sourceGains.get('{}:{}'.format(*key))
+            if gain is None:
+                gain = self.sourceGains.get(str(key[0]))
+            if gain is not None:
+                return gain
+        return self.gain
+
+    def setGain(self, key, gain):
+        source = self.sources.get(key)
+        if source is None:
+            with self.lock:
+                source = self.sources[key] = [jitterBuffer(self.minDepth, self.maxDepth), gain]
+        source[1] = gain
+
+    def remove(self, key):
+        with self.lock:
+            self.sources.pop(key, None)
+
+    def reset(self):
+        with self.lock:
+            for jbuf, gain in self.sources.values():
+                jbuf.reset()
+
+    def get(self):
+        # next mixed frame or None when every source is idle
+        with self.lock:
+            sources = list(self.sources.values())
+        frames = []
+        for jbuf, gain in sources:
+            frame = jbuf.get()
+            if frame is not None:
+                frames.append((frame, gain))
+
+        if not frames:
+            return None
+        if len(frames) == 1 and frames[0][1] == 1.0:
+            return frames[0][0]                     # one talker at unity, nothing to mix
+
+        mix = np.zeros(len(frames[0][0]) // 2, dtype=np.float32)
+        for frame, gain in frames:
+            mix += np.frombuffer(frame, dtype='<i2') * np.float32(gain)
+        if len(frames) > 1:
+            self.mixed += 1
+        if np.abs(mix).max() > CLIP_KNEE * FULL_SCALE:
+            self.clipped += 1
+            mix = softClip(mix)
+        return mix.astype('<i2').tobytes()
+
+    def summary(self):
+        with self.lock:
+            sources = list(self.sources.items())
+        return 'sources {} mixed {} clipped {}'.format(len(sources), self.mixed, self.clipped) + \
+            ''.join('; {} {}'.format(key, jbuf.summary()) for key, (jbuf, gain) in sources)
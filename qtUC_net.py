@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC USRP transmit fan-out
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import socket
+import qtUC_util as ut
+
+FAIL_LIMIT = 50                                     # consecutive failed sends (1s of voice) before a destination is down
+LOG_EVERY = 500                                     # after the first, log every n-th error of a destination
+
+
+def resolve(host, port):
+    # numeric (ip, port) for host, or (host, port) if it can't be resolved now
+    try:
+        return socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+    except (OSError, IndexError) as e:
+        ut.log.error('Unable to resolve {}: {}'.format(host, e))
+        return (host, port)
+
+
+class txDestination():
+    # One AB tx port, its resolved address, optional connected socket and counters
+    def __init__(self, addr, sock=None):
+        self.addr = addr
+        self.sock = sock                            # connected socket, None = sendto on the shared socket
+        self.sent = 0
+        self.errors = 0
+        self.failing = 0                            # consecutive errors
+        self.lastError = ''
+
+    def fail(self, e):
+        self.errors += 1
+        self.failing += 1
+        self.lastError = str(e)
+        if self.errors == 1 or self.errors % LOG_EVERY == 0:
+            ut.log.error('Send to {}:{} failed ({} errors): {}'.format(self.addr[0], self.addr[1], self.errors, e))
+
+    def summary(self):
+        return '{}:{} sent {} errors {}'.format(self.addr[0], self.addr[1], self.sent, self.errors)
+
+
+class txFanout():
+    # Sends every packet to each AB tx port. Addresses are resolved once, and
+    # when connect is set each port gets its own connected socket so a send
+    # is a plain send() with no address to parse or look up. Connected
+    # sockets have their own source port, so they are only used when rx has
+    # a port of its own (replies don't depend on where tx came from);
+    # otherwise the shared socket's sendto is used with the resolved address.
+    # Sends go straight to the sockets in both the thread and asyncio modes,
+    # so send errors are seen and counted here.
+    def __init__(self, udp, host, ports, connect=False):
+        self.udp = udp                              # shared (rx) socket
+        self.host = host                            # as configured, see matches()
+        self.ports = list(ports)
+        self.dests = []
+        for port in ports:
+            addr = resolve(host, port)
+            sock = None
+            if connect:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                try:
+                    sock.connect(addr)
+                except OSError as e:
+                    ut.log.warning('Unable to connect a socket to {}:{}, using the shared socket: {}'.format(addr[0], addr[1], e))
+                    sock.close()
+                    sock = None
+            self.dests.append(txDestination(addr, sock))
+        names = ['{}:{}{}'.format(d.addr[0], d.addr[1], ' connected' if d.sock else '') for d in self.dests]
+        ut.log.debug('tx fan-out: ' + ', '.join(names))
+
+    def send(self, data):
+        # data to every destination, False once every destination is down
+        sendto = self.udp.sendto
+        alive = False
+        for dest in self.dests:
+            try:
+                if dest.sock is not None:
+                    dest.sock.send(data)
+                else:
+                    sendto(data, dest.addr)
+                dest.sent += 1
+                dest.failing = 0
+                alive = True
+            except OSError as e:
+                dest.fail(e)
+                alive = alive or dest.failing < FAIL_LIMIT
+        return alive
+
+    def matches(self, host, ports):
+        # still sending where the settings say
+        return host == self.host and ports == self.ports
+
+    def close(self):
+        for dest in self.dests:
+            if dest.sock is not None:
+                dest.sock.close()
+                dest.sock = None
+
+    def summary(self):
+        return ', '.join(d.summary() for d in self.dests)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC received call recorder
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import os
+import re
+import threading
+import queue
+import wave
+from time import localtime, strftime
+import qtUC_util as ut
+
+RECORD_RATE = 8000
+WRITE_BATCH = 25                                    # frames per file write (0.5s)
+FILE_BUFFER = 1 << 16
+
+# queue messages
+REC_START = 0
+REC_FRAME = 1
+REC_END = 2
+REC_STOP = 3                                        # writer exits once everything before it is written
+
+
+class callRecorder(threading.Thread):
+    # Writes received 8K frames to one WAV file per call.
+    # The rx thread only queues, frames are bounded by a semaphore and dropped
+    # (and counted) when the writer falls behind. Start/end are never dropped.
+    # shutdown() waits for the frames already queued to be written.
+    def __init__(self, destDir, maxFrames=500):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.destDir = destDir
+        self.queue = queue.Queue()
+        self.slots = threading.BoundedSemaphore(maxFrames)     # frames queued but not yet written
+
+        # writer state
+        self.file = None
+        self.wav = None
+        self.path = ''
+        self.batch = []
+
+        # stats
+        self.frames = 0                             # frames written
+        self.dropped = 0                            # frames dropped, queue full
+        self.calls = 0
+
+    def shutdown(self):
+        self.queue.put((REC_STOP, None))
+        if self.is_alive():
+            self.join()                             # the last call's file is complete on return
+
+    # -- rx thread side -- #
+    def startCall(self, call, tg):
+        self.queue.put((REC_START, (call, tg)))
+
+    def frame(self, audio):
+        if self.slots.acquire(blocking=False):
+            self.queue.put((REC_FRAME, bytes(audio)))       # own a copy, the rx buffer is reused
+        else:
+            self.dropped += 1
+
+    def endCall(self):
+        self.queue.put((REC_END, None))
+
+    # -- writer thread -- #
+    def run(self):
+        ut.log.info('Starting call recorder, saving to ' + self.destDir)
+        while True:
+            msg, data = self.queue.get()
+            if msg == REC_STOP:
+                break
+            if msg == REC_FRAME:
+                self.batch.append(data)
+                self.slots.release()
+                if len(self.batch) >= WRITE_BATCH:
+                    self.flush()
+            elif msg == REC_START:
+                self.close()
+                self.open(*data)
+            else:
+                self.close()
+        self.close()
+        ut.log.info('Call recorder: {} calls, {} frames, {} dropped'.format(self.calls, self.frames, self.dropped))
+
+    def fileName(self, call, tg):
+        name = '{}_{}_{}.wav'.format(strftime('%Y%m%d-%H%M%S', localtime()), call or 'unknown', tg)
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+
+    def open(self, call, tg):
+        try:
+            os.makedirs(self.destDir, exist_ok=True)
+            self.path = os.path.join(self.destDir, self.fileName(call, tg))
+            self.file = open(self.path, 'wb', buffering=FILE_BUFFER)
+            self.wav = wave.open(self.file, 'wb')
+            self.wav.setnchannels(1)
+            self.wav.setsampwidth(2)
+            self.wav.setframerate(RECORD_RATE)
+            self.calls += 1
+        except Exception as e:
+            ut.log.error('Unable to record call to ' + self.path + ': ' + str(e))
+            self.file = None
+            self.wav = None
+
+    def flush(self):
+        if self.wav is not None and self.batch:
+            try:
+                self.wav.writeframesraw(b''.join(self.batch))     # header is patched on close
+                self.frames += len(self.batch)
+            except Exception as e:
+                ut.log.error('Call recording write failed: ' + str(e))
+        self.batch = []
+
+    def close(self):
+        # end of call, header updated and the file synced to disk
+        self.flush()
+        if self.wav is None:
+            return
+        try:
+            self.wav.close()                        # leaves our file object open
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            ut.log.debug('Recorded ' + self.path)
+        except Exception as e:
+            ut.log.error('Call recording close failed: ' + str(e))
+        self.wav = None
+        self.file = None
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC audio resampler
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+from math import gcd, ceil
+import numpy as np
+
+TAPS_PER_PHASE = 24                                 # filter length of each polyphase branch
+KAISER_BETA = 8.0                                   # ~80dB stopband
+PASSBAND = 0.90                                     # cutoff as a fraction of the lower Nyquist
+
+
+class polyResampler():
+    # Streaming polyphase FIR resampler for 16 bit mono audio.
+    # The rate change in/out is reduced to up L / down M. The prototype
+    # low pass is split into L branches of TAPS_PER_PHASE taps, and for each
+    # output sample only the branch for its phase is applied. Input history
+    # and phase are carried between calls so frames can be fed one at a time.
+    def __init__(self, inRate, outRate, taps=TAPS_PER_PHASE):
+        g = gcd(inRate, outRate)
+        self.inRate = inRate
+        self.outRate = outRate
+        self.up = outRate // g                      # L
+        self.down = inRate // g                     # M
+        self.taps = ceil(taps * max(1.0, self.down / self.up))                 # longer filter when decimating
+
+        # prototype low pass at the upsampled rate, windowed sinc
+        n = self.up * self.taps
+        fc = PASSBAND * 0.5 * min(inRate, outRate) / (inRate * self.up)       # normalised to the upsampled rate
+        t = np.arange(n) - (n - 1) / 2
+        h = 2 * fc * np.sinc(2 * fc * t) * np.kaiser(n, KAISER_BETA)
+        h *= self.up / h.sum()                      # unity DC gain through each phase branch
+
+        # bank[phase, k] = h[phase + k * L]
+        self.bank = np.ascontiguousarray(h.reshape(self.taps, self.up).T)
+
+        self.reset()
+        self.plans = {}                             # (pos, frame length): (phases, gather index, next pos)
+
+    def reset(self):
+        self.hist = np.zeros(self.taps - 1)         # last taps-1 input samples
+        self.pos = 0                                # next output position in 1/L input samples
+
+    def plan(self, nin):
+        # output phases and input gather indexes for a frame, cached as the
+        # position repeats with a period of at most L frames
+        key = (self.pos, nin)
+        p = self.plans.get(key)
+        if p is None:
+            end = nin * self.up
+            positions = np.arange(self.pos, end, self.down)
+            phases = positions % self.up
+            base = positions // self.up + (self.taps - 1)                   # index into hist + frame
+            index = base[:, None] - np.arange(self.taps)[None, :]
+            nextPos = int(self.pos + len(positions) * self.down - end)
+            p = (self.bank[phases], index, nextPos)
+            self.plans[key] = p
+        return p
+
+    def process(self, x):
+        # resample a block of float samples, returns float samples
+        coefs, index, nextPos = self.plan(len(x))
+        buf = np.concatenate((self.hist, x))
+        y = np.einsum('ij,ij->i', coefs, buf[index])
+        self.hist = buf[len(buf) - (self.taps - 1):]
+        self.pos = nextPos
+        return y
+
+    def convert(self, audio):
+        # resample a 16 bit (little endian) mono frame, bytes in, bytes out
+        y = self.process(np.frombuffer(audio, dtype='<i2'))
+        return np.clip(np.rint(y), -32768, 32767).astype('<i2').tobytes()
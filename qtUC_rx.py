@@ -24,17 +24,29 @@
 # ------------------------------------------------------------------------------- #
 import threading
 import sys
-from time import time
-import struct
+import socket
+import select
+from time import time, monotonic
 import pyaudio
-import audioop
-from math import log10
+import os
 import json
-import hashlib
 import qtUC_const as const
 import qtUC_defs as defs
 from qtUC_vars import qtUCVars as cfg  # configuration variables
 import qtUC_util as ut
+from qtUC_usrp import usrpDecoder, usrpDispatcher
+from qtUC_jitter import jitterBuffer, jitterPlayout
+from qtUC_stats import batchStats
+from qtUC_resample import polyResampler
+from qtUC_audio import callbackOutput, channelFanout, parseChannelMap
+from qtUC_xfer import xferManager
+from qtUC_dsp import levelMeter, silenceGate, rxAgc
+from qtUC_codec import VOICE_NAMES
+from qtUC_session import sessionTable
+from qtUC_record import callRecorder
+from qtUC_capture import captureWriter
+from qtUC_mixer import rxMixer, parseSourceGains
+from qtUC_watchdog import eotWatchdog
 
 # message types
 MSG_USRP = bytes("USRP", 'ASCII')
@@ -44,6 +56,12 @@ MSG_OK = bytes("OK", 'ASCII')
 MSG_INFO = bytes("INFO:", 'ASCII')
 MSG_EXITING = bytes("EXITING", 'ASCII')
 
+# rx call fields kept per source when mixing, with their idle values
+CALL_STATE = ('call', 'name', 'tg', 'rxslot', 'callmode', 'loss', 'start_time', 'rxCall')
+CALL_IDLE = ('', '', '', '0', '', '0.00%', 0, False)
+EXPIRED_CALL = ('call', 'name', 'tg', 'rxslot', 'callmode')     # restored if voice returns after a watchdog end
+EXPIRED_RESUME = 5.0                                # seconds an expired call can be resumed
+
 
 class qtUcRx(threading.Thread):
     def __init__(self, udp, pya):
@@ -56,20 +74,42 @@ class qtUcRx(threading.Thread):
         self.outIndex = cfg.out_index               # output device index
         self.portName = ''
         self.format = pyaudio.paInt16
-        self.chunk = 160 if cfg.SAMPLE_RATE == 8000 else (160 * 6)     # Size of chunk to read
+        self.chunk = cfg.SAMPLE_RATE // 50          # Size of chunk to write (20ms)
         self.channels = 1                           # output device channels
         self.rate = cfg.SAMPLE_RATE
 
         self.stream = None                          # output audio stream
+        self.jitter = None                          # optional jitter buffer and playout thread
+        self.playout = None
+        self.mixer = None                           # optional multi source mixer (instead of one talker)
 
         # runtime
         self.currentMode = ''                       # current operating mode
-        self.lastKey = -1
         self.start_time = time()
-        self.state = None
+        self.resampler = polyResampler(8000, self.rate) if self.rate != 8000 else None      # 8K > device rate
         self.rxCall = False                         # current Rx state
-        self.lastseq = 0                            # previous packet sequence number
-        self.rxlevelAvg = 0
+        self.meter = levelMeter(cfg.meter_rate, cfg.meter_offset, cfg.meter_hold)
+        self.meter.onLevel = lambda level, peak: self.onRxLevel(level, peak)
+        self.agc = rxAgc(cfg.agc_target, cfg.agc_max_gain, cfg.agc_attack, cfg.agc_release, enabled=cfg.rx_agc)
+        self.gate = None                            # silence fast path, needs the device channels
+        self.fanout = None                          # mono > device channels
+        self.recorder = None                        # optional per call WAV recorder
+        if cfg.record_calls:
+            self.recorder = callRecorder(cfg.record_dir or os.path.join(ut.DOCPATH, 'recordings'), cfg.record_queue)
+            self.recorder.start()
+        self.recording = None                       # session whose call is being recorded
+        self.lock = threading.Lock()                # packet processing vs the EOT watchdog
+        self.watchdog = None                        # ends calls whose unkey frame was lost
+        if cfg.eot_timeout > 0:
+            self.watchdog = eotWatchdog(cfg.eot_timeout)
+            self.watchdog.onExpire = self.missedEot
+        self.capture = None                         # optional raw datagram capture for replays
+        if cfg.capture_file:
+            try:
+                self.capture = captureWriter(cfg.capture_file)
+                ut.log.info('Capturing USRP datagrams to ' + cfg.capture_file)
+            except Exception as e:
+                ut.log.error('Unable to capture to ' + cfg.capture_file + ': ' + str(e))
 
         # rx call info
         self.call = ''
@@ -92,6 +132,26 @@ class qtUcRx(threading.Thread):
         # self.mpxid = None
         # self.reserved = None
         self.audio = b''
+        self.decoder = usrpDecoder()                # reused rx buffer and header decode
+        self.source = None                          # address of the current packet
+        self.sessions = sessionTable(cfg.session_hold)                  # per source state, active talker
+        self.session = self.sessions.get(None)      # session of the current packet (None = local/replay)
+        self.stats = self.session.stats             # loss/jitter accounting of the active talker
+        self.callSession = self.session             # session the rx call fields belong to (mixing)
+        self.batchPool = [usrpDecoder() for _ in range(cfg.rx_batch)] if cfg.rx_batch > 1 else None
+        self.batchStats = batchStats()
+
+        # packet handlers by type and tlv tag
+        self.dispatcher = usrpDispatcher()
+        self.dispatcher.register(const.USRP_TYPE_VOICE, self.processAudio)
+        self.dispatcher.register(const.USRP_TYPE_VOICE_ULAW, self.processCodedAudio)
+        self.dispatcher.register(const.USRP_TYPE_VOICE_ADPCM, self.processCodedAudio)
+        self.dispatcher.register(const.USRP_TYPE_TEXT, self.processText)
+        self.dispatcher.register(const.USRP_TYPE_PING, self.processPing)
+        self.dispatcher.register(const.USRP_TYPE_TLV, self.processTLV)
+        self.dispatcher.registerTLV(const.TLV_TAG_SET_INFO, self.processTLVText)
+        self.dispatcher.registerTLV(const.TLV_TAG_FILE_XFER, self.processFileXfer)
+        self.xfer = xferManager(cfg.xfer_dir or os.path.join(ut.DOCPATH, 'files'))     # files pushed by AB
 
         # external handlers
         self.onError = self.nullHandler
@@ -110,6 +170,25 @@ class qtUcRx(threading.Thread):
 
     def shutdown(self):
         self.quit = True
+        if self.playout is not None:
+            self.playout.shutdown()
+        if self.watchdog is not None:
+            self.watchdog.shutdown()
+            ut.log.info('rx watchdog: {} missed EOT'.format(self.watchdog.expired))
+        if self.batchPool is not None:
+            ut.log.info('rx batches: ' + self.batchStats.summary())
+        ut.log.info('rx packets: ' + self.dispatcher.summary())
+        ut.log.info('rx sessions: ' + self.sessions.summary())
+        if self.mixer is not None:
+            ut.log.info('rx mixer: ' + self.mixer.summary())
+        elif self.jitter is not None:
+            ut.log.info('rx jitter buffer: ' + self.jitter.summary())
+        ut.log.info('rx output: {}'.format(self.outputStats()))
+        self.xfer.abortAll()
+        if self.recorder is not None:
+            self.recorder.shutdown()
+        if self.capture is not None:
+            self.capture.close()
         # while self.rxCall:                          # in a call?
         #    sleep(.25)                               # wait a bit before exiting
 
@@ -134,14 +213,17 @@ class qtUcRx(threading.Thread):
 
         #  open the output
         try:
-            self.stream = self.pya.open(format=self.format,
-                                        channels=self.channels,
-                                        rate=self.rate,
-                                        # input=False,
-                                        output=True,
-                                        frames_per_buffer=self.chunk,
-                                        output_device_index=self.outIndex
-                                        )
+            if cfg.audio_callback:                  # device pulls from a ring buffer, writes never block
+                self.stream = callbackOutput(self.pya, self.channels, self.rate, self.chunk, self.outIndex)
+            else:
+                self.stream = self.pya.open(format=self.format,
+                                            channels=self.channels,
+                                            rate=self.rate,
+                                            # input=False,
+                                            output=True,
+                                            frames_per_buffer=self.chunk,
+                                            output_device_index=self.outIndex
+                                            )
         except Exception:
             errmsg = defs.STRING_FATAL_OUTPUT_STREAM + str(sys.exc_info()[1])
             ut.log.critical(errmsg)
@@ -153,85 +235,219 @@ class qtUcRx(threading.Thread):
         self.portName = parms.get('name')
         ut.log.info("Output Device: {} Index: {}".format(self.portName, self.outIndex))
         self.connected = True
+        if self.channels > 1:
+            chans = parseChannelMap(cfg.channel_map, self.channels)
+            self.fanout = channelFanout(self.channels, chans, 2 * self.chunk)
+            ut.log.info('Output channels {} of {}'.format(chans, self.channels))
+        self.gate = silenceGate(cfg.silence_level, 2 * self.chunk * self.channels, cfg.comfort_noise)
+
+        if cfg.rx_mix:                              # every source played, mixed through per source jitter buffers
+            self.mixer = rxMixer(cfg.jitter_min, cfg.jitter_max, cfg.mix_gain, parseSourceGains(cfg.mix_source_gain))
+            self.sessions.onExpire = lambda session: self.mixer.remove(session.addr)    # idle sources leave the mix
+            self.playout = jitterPlayout(self.mixer)
+            self.playout.onFrame = self.playAudio
+        elif cfg.jitter_buffer:                     # play out via the jitter buffer
+            self.jitter = jitterBuffer(cfg.jitter_min, cfg.jitter_max)
+            self.playout = jitterPlayout(self.jitter)
+            self.playout.onFrame = self.playAudio
+
+    def outputStats(self):
+        # underrun/overrun counters for callback output, silent frames elided
+        stats = self.stream.stats() if isinstance(self.stream, callbackOutput) else {}
+        if self.gate is not None:
+            stats['elided'] = self.gate.elided
+        return stats
+
+    def startPlayout(self):
+        # safe to call again, the aio fallback starts the rx thread after the playout
+        if self.playout is not None and self.playout.ident is None:
+            self.playout.start()
+        if self.watchdog is not None and self.watchdog.ident is None:
+            self.watchdog.start()
 
     def run(self):
         ut.log.info('Starting rx audio thread')
+        self.startPlayout()
+        if self.batchPool is not None:
+            self.runBatched()
+            return
+
         while not self.quit:
-            soundData, addr = self.udp.recvfrom(1024)
+            addr = self.decoder.recvfrom(self.udp)  # datagram straight into the decoder buffer
             # if self.quit:                         # exit whilst receiving
             #    # self.rxCall = False
             #    break
-            if addr[0] != cfg.ip_address:           # not the same as configured?
-                cfg.ip_address = addr[0]            # OK, this was supposed to help set the ip to a server, but multiple servers ping/pong.  I may remove it.
-            self.rxAudioStream(soundData)
+            self.rxDatagram(addr)
+
+    def runBatched(self):
+        # drain every pending datagram on each wakeup, then process the batch
+        dontwait = getattr(socket, 'MSG_DONTWAIT', 0)          # not available on Windows
+        while not self.quit:
+            ready, _, _ = select.select([self.udp], [], [], 0.5)
+            if not ready:
+                continue
+
+            count = 0
+            addrs = []
+            for dec in self.batchPool:
+                if count and not dontwait and not select.select([self.udp], [], [], 0)[0]:
+                    break
+                try:
+                    addrs.append(dec.recvfrom(self.udp, dontwait))
+                except (BlockingIOError, InterruptedError):
+                    break
+                count += 1
+            self.batchStats.update(count)
+
+            for idx in range(count):
+                self.decoder = self.batchPool[idx]
+                self.rxDatagram(addrs[idx])
+
+    def checkSource(self, addr):
+        # per source session, several AB instances may be sending to us
+        self.source = addr
+        self.session = self.sessions.get(addr)
+        if self.mixer is not None:
+            self.switchCall(self.session)
+
+    def switchCall(self, session):
+        # mixing: each source has its own call in progress, swap its fields in
+        current = self.callSession
+        if session is current:
+            return
+        current.callState = tuple(getattr(self, k) for k in CALL_STATE)
+        for k, v in zip(CALL_STATE, session.callState or CALL_IDLE):
+            setattr(self, k, v)
+        self.stats = session.stats
+        self.callSession = session
+
+    def takeFloor(self, session):
+        # session is now the active talker, close a call the previous one left open
+        if session.stats is not self.stats:
+            if self.rxCall:
+                ut.log.warning('Call EOT missed, rx source changed')
+                self.endCall()
+            self.stats = session.stats
+            session.codec.reset()                   # its adpcm frames were skipped while another source talked
+            if self.jitter is not None:
+                self.jitter.reset()
 
     # Null event handler
     def nullHandler(self, *args):
         return
 
     # RX data processing
-    def rxAudioStream(self, soundData):
-        if (soundData[0:4] == MSG_USRP):            # we only handle USRP packets
-            # decode the packet
-            eye = soundData[0:4]                                    # not used
-            self.seq, = struct.unpack(">i", soundData[4:8])
-            memory, = struct.unpack(">i", soundData[8:12])          # not used
-            self.keyup, = struct.unpack(">i", soundData[12:16])
-            talkgroup, = struct.unpack(">i", soundData[16:20])      # not used
-            self.typestr, = struct.unpack("i", soundData[20:24])
-            mpxid, = struct.unpack(">i", soundData[24:28])          # not used
-            reserved, = struct.unpack(">i", soundData[28:32])       # not used
-            self.audio = soundData[32:]
-
-            # process it
-            if (self.typestr == const.USRP_TYPE_VOICE):             # voice
-                self.processAudio()
-            elif (self.typestr == const.USRP_TYPE_TEXT):            # metadata
-                # self.processMetadata()
-                if (self.audio[0:4] == MSG_REG):
-                    self.processRegistration()
-                elif (self.audio[4:9] == MSG_UNREG):
-                    self.processRegistration()
-                elif (self.audio[0:5] == MSG_INFO):
-                    self.processInfo()
-                else:
-                    self.processTLVText()
-            elif (self.typestr == const.USRP_TYPE_PING):
-                self.processPing()
-            elif (self.typestr == const.USRP_TYPE_TLV):
-                self.processTLV()
-
-    def processAudio(self):
-        # audio = soundData[32:]
+    def rxAudioStream(self, soundData, addr=None):
+        # process a datagram received elsewhere (replay etc)
+        self.decoder.load(soundData)
+        self.rxDatagram(addr)
+
+    def rxDatagram(self, addr):
+        # the datagram held by the decoder, from addr
+        with self.lock:                             # the watchdog may be ending a call
+            self.checkSource(addr)
+            self.rxPacket()
+
+    def rxPacket(self):
+        # process the datagram currently held by the decoder
+        if self.capture is not None:
+            self.capture.write(self.decoder.view[:self.decoder.nbytes], self.source)
+        if self.decoder.decode():                   # we only handle USRP packets
+            self.seq = self.decoder.seq
+            self.keyup = self.decoder.keyup
+            self.typestr = self.decoder.type
+            self.audio = self.decoder.payload()     # view into the rx buffer, no copy
+
+            if self.typestr not in VOICE_NAMES:
+                self.audio = bytes(self.audio)      # text/tlv handlers need a real bytes object
+            self.dispatcher.dispatch(self.typestr)
+
+    def processText(self):
+        # metadata
+        if (self.audio[0:4] == MSG_REG):
+            self.processRegistration()
+        elif (self.audio[4:9] == MSG_UNREG):
+            self.processRegistration()
+        elif (self.audio[0:5] == MSG_INFO):
+            self.processInfo()
+        elif len(self.audio) > 0:
+            self.dispatcher.dispatchTLV(self.audio[0])         # Tunnel a TLV inside of a USRP packet
+
+    def processAudio(self, codec=None):
+        # audio = soundData[32:], codec set for u-law/adpcm voice still to be decoded
         # print(eye, seq, memory, keyup, talkgroup, type, mpxid, reserved, audio, len(audio), len(soundData))
-        if self.connected and len(self.audio) == 320:
-            # audio output - input stream data is always mono
-            if self.rate == 48000:
-                (audio48, self.state) = audioop.ratecv(self.audio, 2, 1, 8000, 48000, self.state)
-                if self.channels > 1:
-                    audio48 = audioop.tostereo(audio48, 2, 1, 1)
-                self.stream.write(bytes(audio48), self.chunk)
-
-                # waggle the meter
-                if (self.seq % cfg.level_every_sample) == 0:
-                    rms = audioop.rms(self.audio, 2)        # Get a relative power value for the sample
-                    self.rxLevel(rms)
-            else:
-                self.stream.write(self.audio, self.chunk)
-
-        # change of state - idle > Rx, Rx > idle
-        # print(self.keyup, self.lastKey)
-        if self.keyup != self.lastKey:
-            # print('key change ', self.keyup, self.lastKey)
+        session = self.session
+        if self.mixer is None:
+            if not self.sessions.claim(session, self.keyup):
+                session.lastKey = self.keyup        # another source has the floor
+                return
+            self.takeFloor(session)
+        if not self.stats.update(self.seq):         # loss/jitter accounting, False for a duplicate
+            return
+        if codec is not None and self.stats.highest != self.seq:
+            return                                  # late coded frame, decoding it would corrupt the adpcm state
+
+        # change of state - idle > Rx before the frame is used, Rx > idle after it
+        # print(self.keyup, session.lastKey)
+        keyChange = self.keyup != session.lastKey
+        if keyChange:
+            # print('key change ', self.keyup, session.lastKey)
             ut.log.debug('key' if self.keyup else 'unkey')
             if self.keyup > 0:
                 self.callStart()
                 # print('Rx start')
-            else:                                       # self.keyup == False:
-                # print('Rx end')
-                self.endCall()
 
-        self.lastKey = self.keyup                       # save key state of this packet
+        if codec is not None:                           # only accepted, in order frames reach the decoder
+            if keyChange:
+                codec.reset()                           # adpcm state starts fresh each call
+            self.audio = codec.decode(self.typestr, self.audio)
+
+        if len(self.audio) == 320:
+            if self.recorder is not None and (self.mixer is None or self.recording is session):
+                self.recorder.frame(self.audio)
+            if self.connected:
+                if self.mixer is not None:
+                    self.mixer.put(session.addr, self.seq, bytes(self.audio))
+                elif self.jitter is not None:
+                    self.jitter.put(self.seq, bytes(self.audio))    # own a copy, the rx buffer is reused
+                else:
+                    self.playAudio(self.audio)
+        if self.connected and not self.keyup:           # end of the over, no concealment after it
+            if self.mixer is not None:
+                self.mixer.end(session.addr, self.seq)
+            elif self.jitter is not None:
+                self.jitter.end(self.seq)
+
+        if keyChange and not self.keyup:
+            # print('Rx end')
+            self.endCall()
+
+        session.lastKey = self.keyup                    # save key state of this packet
+        if self.watchdog is not None:
+            if self.keyup:
+                self.watchdog.touch(session)            # end the call if voice stops without an unkey
+            else:
+                self.watchdog.cancel(session)
+
+    def processCodedAudio(self):
+        # u-law/adpcm voice, expanded to 8K pcm by processAudio once the sequence is checked
+        self.processAudio(self.session.codec)
+
+    def playAudio(self, audio):
+        # audio output - input stream data is always mono
+        if self.gate.elide(audio):                      # hang time silence, skip the resampler
+            self.stream.write(self.gate.fill(), self.chunk)
+        else:
+            self.agc.setVolume(cfg.sp_vol)
+            audioOut = self.agc.process(audio)                  # level and volume at 8K, before resampling
+            if self.resampler is not None:
+                audioOut = self.resampler.convert(audioOut)
+            if self.fanout is not None:
+                audioOut = self.fanout.process(audioOut)        # read only view, reused next frame
+            elif self.resampler is None:
+                audioOut = bytes(audioOut)                      # payload may be a view into the rx buffer
+            self.stream.write(audioOut, self.chunk)
+        self.meter.feed(audio)                                  # waggle the meter
 
     def processRegistration(self):
         if (self.audio[4:6] == MSG_OK):
@@ -284,101 +500,113 @@ class qtUcRx(threading.Thread):
             # self.selectTGByValue(obj["last_tune"])
 
     def processTLVText(self):
-        # Tunnel a TLV inside of a USRP packet
-        if self.audio[0] == const.TLV_TAG_SET_INFO:
-            if self.rxCall:  # enableTX:    # EOT missed?
-                ut.log.warning('Call EOT in tlv info')
-                self.endCall()
-            # print('info data ', self.audio)
-            rxid = (self.audio[2] << 16) + (self.audio[3] << 8) + self.audio[4]          # Source
-            # print('rid ', rid)
-            # print(self.audio[5],self.audio[6],self.audio[7],self.audio[8])
-            self.tg = (self.audio[9] << 16) + (self.audio[10] << 8) + self.audio[11]    # Dest
-            # print('tg ', self.tg)
-            self.rxslot = self.audio[12]
-            # print('slot ', self.rxslot)
-            rxcc = self.audio[13]
-            # print('rxcc ', rxcc)
-            self.callmode = defs.STRING_PRIVATE if (rxcc & 0x80) else defs.STRING_GROUP
-            self.name = ""
-            if self.audio[14] == 0:                             # C string termintor for call
-                self.call = str(rxid)
-            else:
-                self.call = self.audio[14:self.audio.find(b'\x00', 14)].decode('ASCII')
-                if self.call[0] == '{':                         # its a json dict
-                    obj = json.loads(self.call)
-                    self.call = obj['call']
-                    self.name = obj['name'].split(' ')[0] if 'name' in obj else ""
-            self.rxCallInfo()
-
-            if ((rxcc & 0x80) and (rxid > 10000)):   # > 10000 to exclude "4000" from BM
-                # a dial string with a pound is a private call, see if the current TG matches
-                privateTG = str(rxid) + '#'
-                ut.log.debug('rid {} - call tg {}'.format(rxid, self.tg))
-                ut.log.debug('rx callmode ' + privateTG)
-                self.onChangeTG(privateTG)              # add and select dialled TG
+        # TLV_TAG_SET_INFO, call details
+        if self.mixer is None:
+            if self.sessions.busy(self.session):
+                ut.log.debug('Call info from {} ignored, another source is active'.format(self.source))
+                return
+            self.sessions.take(self.session)
+            self.takeFloor(self.session)
+        if self.rxCall:  # enableTX:    # EOT missed?
+            ut.log.warning('Call EOT in tlv info')
+            self.endCall()
+        # print('info data ', self.audio)
+        rxid = (self.audio[2] << 16) + (self.audio[3] << 8) + self.audio[4]          # Source
+        # print('rid ', rid)
+        # print(self.audio[5],self.audio[6],self.audio[7],self.audio[8])
+        self.tg = (self.audio[9] << 16) + (self.audio[10] << 8) + self.audio[11]    # Dest
+        # print('tg ', self.tg)
+        self.rxslot = self.audio[12]
+        # print('slot ', self.rxslot)
+        rxcc = self.audio[13]
+        # print('rxcc ', rxcc)
+        self.callmode = defs.STRING_PRIVATE if (rxcc & 0x80) else defs.STRING_GROUP
+        self.name = ""
+        if self.audio[14] == 0:                             # C string termintor for call
+            self.call = str(rxid)
+        else:
+            self.call = self.audio[14:self.audio.find(b'\x00', 14)].decode('ASCII')
+            if self.call[0] == '{':                         # its a json dict
+                obj = json.loads(self.call)
+                self.call = obj['call']
+                self.name = obj['name'].split(' ')[0] if 'name' in obj else ""
+        self.rxCallInfo()
+
+        if ((rxcc & 0x80) and (rxid > 10000)):   # > 10000 to exclude "4000" from BM
+            # a dial string with a pound is a private call, see if the current TG matches
+            privateTG = str(rxid) + '#'
+            ut.log.debug('rid {} - call tg {}'.format(rxid, self.tg))
+            ut.log.debug('rx callmode ' + privateTG)
+            self.onChangeTG(privateTG)              # add and select dialled TG
 
     def processPing(self):
-        if self.rxCall:                         # Do we think we are receiving packets?, lets test for EOT missed
-            if (self.lastseq + 1) == self.seq:
+        session = self.session
+        if self.rxCall and (self.mixer is not None or session is self.sessions.active):     # Do we think we are receiving packets?, lets test for EOT missed
+            if (session.lastPingSeq + 1) == self.seq:
                 ut.log.debug("Ping check - missed EOT")
                 self.endCall()
                 # self.onEndRX(self.call, self.rxslot, self.tg, self.loss, self.start_time)
                 # self.log_end_of_transmission(call, rxslot, tg, loss, start_time)
                 # self.enableTX = True    # Idle state, allow local transmit
-            self.lastseq = self.seq
+            session.lastPingSeq = self.seq
+
+    def missedEot(self, session):
+        # watchdog thread - keyed session has sent no voice for eot_timeout
+        with self.lock:
+            if self.mixer is not None:
+                self.switchCall(session)
+            elif session is not self.sessions.active:
+                return
+            if self.rxCall:
+                ut.log.debug('Watchdog - missed EOT')
+                self.session = session
+                expired = tuple(getattr(self, k) for k in EXPIRED_CALL)
+                self.endCall()
+                session.expired = (monotonic(), expired)        # resumed if the same over carries on
+            session.lastKey = False                     # next keyed frame starts a new call
 
     def processTLV(self):
-        tag = self.audio[0]
-        length = self.audio[1]
-        value = self.audio[2:]
-        if tag == const.TLV_TAG_FILE_XFER:
-            FILE_SUBCOMMAND_NAME = 0
-            FILE_SUBCOMMAND_PAYLOAD = 1
-            FILE_SUBCOMMAND_WRITE = 2
-            FILE_SUBCOMMAND_READ = 3
-            FILE_SUBCOMMAND_ERROR = 4
-            if value[0] == FILE_SUBCOMMAND_NAME:
-                file_len = (value[1] << 24) + (value[2] << 16) + (value[3] << 8) + value[4]
-                file_name = value[5:]
-                zero = file_name.find(0)
-                file_name = file_name[:zero].decode('ASCII')
-                ut.log.info("File transfer name: " + file_name)
-                m = hashlib.md5()
-            if value[0] == FILE_SUBCOMMAND_PAYLOAD:
-                ut.log.debug("Payload len = " + str(length - 1))
-                payload = value[1:length]
-                m.update(payload)
-                # ut.log.debug(payload.hex())
-                # ut.log.debug(payload)
-            if value[0] == FILE_SUBCOMMAND_WRITE:
-                digest = m.digest().hex().upper()
-                file_md5 = value[1:33].decode('ASCII')
-                if (digest == file_md5):
-                    ut.log.info("File digest matches")
-                else:
-                    ut.log.info("File digest does not match {} vs {}".format(digest, file_md5))
-                # ut.log.info("write (md5): " + value[1:33].hex())
-            if value[0] == FILE_SUBCOMMAND_ERROR:
-                ut.log.error("error")
+        if len(self.audio) > 0:
+            self.dispatcher.dispatchTLV(self.audio[0])
+
+    def processFileXfer(self):
+        # streamed to disk per source, the TLV value is passed as a view
+        self.xfer.handle(self.source, memoryview(self.audio)[2:], self.audio[1])
 
     def callStart(self):
         self.start_time = time()
         if not self.rxCall:     # missed call start?
+            self.resumeCall()
             self.rxCall = True
             self.onRxStart(self.call, self.name, self.tg)
+            self.recordStart()
 
     def rxCallInfo(self):
         self.rxCall = True
         ut.log.debug('Begin RX: {} {} {} {}'.format(self.call, self.rxslot, self.tg, self.callmode))
         self.onRxStart(self.call, self.name, self.tg)
+        self.recordStart()
+
+    def resumeCall(self):
+        # voice is back after the watchdog ended the call, keep its details unless new ones arrived
+        expired = self.session.expired
+        self.session.expired = None
+        if expired is not None and not self.call and monotonic() - expired[0] < EXPIRED_RESUME:
+            for k, v in zip(EXPIRED_CALL, expired[1]):
+                setattr(self, k, v)
 
     def endCall(self):
         self.rxCall = False
+        self.session.expired = None
+        self.loss = self.stats.lossText()
+        ut.log.info('RX {} tg {}: {}'.format(self.call, self.tg, self.stats.summary()))
         # update
         # print('end call ', self.call, self.tg)
         # print('max ', self.rxMax)
+        self.meter.reset()
+        self.agc.reset()
         self.onRxLevel(0)
+        self.recordEnd()
         self.onRxEnd(self.call, self.name, self.currentMode, self.rxslot,
                      self.tg, self.callmode, self.loss, self.start_time)
 
@@ -389,30 +617,24 @@ class qtUcRx(threading.Thread):
         self.name = ''
         self.rxslot = '0'
         self.tg = ''
-        self.loss = '0.00%'    # is this always zero?
+        self.loss = '0.00%'
+        self.stats.reset()
         self.start_time = 0
         self.callmode = ''
 
+    def recordStart(self):
+        # when mixing only one call at a time is recorded
+        if self.recorder is not None and (self.mixer is None or self.recording is None):
+            self.recording = self.session
+            self.recorder.startCall(self.call, self.tg)
+
+    def recordEnd(self):
+        if self.recorder is not None and (self.mixer is None or self.recording is self.session):
+            self.recording = None
+            self.recorder.endCall()
+
     def changeRxMode(self, mode, tg):
         # Rx mode update
         self.currentMode = mode
         self.tg = tg
         self.onChangeMode(mode, tg)         # pass it on
-
-    def rxLevel(self, level):
-        # smooth out rx levels
-        lvl = int(level / 100)
-        avg = int((lvl + self.rxlevelAvg) / 2)
-        if avg > self.rxlevelAvg:
-            self.rxlevelAvg = avg
-
-        if self.rxlevelAvg >= 0:
-            if self.rxlevelAvg > 0:
-                lvDB = int(20 * log10(self.rxlevelAvg))
-            else:
-                lvDB = 0
-            # if lvDB > self.rxMax:
-            #     self.rxMax = lvDB
-            self.onRxLevel(lvDB)
-            self.rxlevelAvg -= 2
-            # print('max ', self.rxMax, ' avg ', lvDB)
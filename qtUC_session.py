@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC rx sessions, one per USRP source
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+from time import monotonic
+from qtUC_stats import callStats
+from qtUC_codec import voiceCodec
+import qtUC_util as ut
+
+SESSION_EXPIRE = 300                                # forget sources idle for this long (seconds)
+EXPIRE_CHECK = 10                                   # seconds between idle source checks
+
+
+class rxSession():
+    # State of one USRP source (address, port)
+    def __init__(self, addr):
+        self.addr = addr
+        self.lastKey = -1                           # key state of the previous voice packet
+        self.lastPingSeq = 0                        # seq of the previous ping (missed EOT check)
+        self.stats = callStats()                    # seq, duplicate and jitter accounting
+        self.codec = voiceCodec()                   # u-law/adpcm decode state
+        self.callState = None                       # saved rx call fields while another source is current (mixing)
+        self.expired = None                         # (time, call fields) of a call the EOT watchdog ended
+        self.lastHeard = monotonic()
+        self.lastVoice = 0.0
+        self.packets = 0
+        self.dropped = 0                            # voice dropped, another source had the floor
+
+    def summary(self):
+        return '{} packets {} dropped {}'.format(self.addr, self.packets, self.dropped)
+
+
+class sessionTable():
+    # Sessions keyed by source address. One session at a time holds the
+    # floor (the active talker), it keeps it until it has sent no voice for
+    # holdTime, so redundant AB instances relaying the same call are dropped
+    # instead of producing extra call start/end events.
+    def __init__(self, holdTime=0.5):
+        self.holdTime = holdTime
+        self.sessions = {}                          # addr: rxSession
+        self.active = None                          # session holding the floor
+        self.switches = 0                           # floor changes between sources
+        self.lastExpire = monotonic()
+
+        # external handlers
+        self.onExpire = self.nullHandler            # called with each session forgotten
+
+    # Null event handler
+    def nullHandler(self, *args):
+        return
+
+    def get(self, addr):
+        now = monotonic()
+        session = self.sessions.get(addr)
+        if session is None or now - self.lastExpire > EXPIRE_CHECK:
+            self.expire()
+        if session is None:
+            session = self.sessions[addr] = rxSession(addr)
+            ut.log.debug('New rx source {}'.format(addr))
+        session.lastHeard = now
+        session.packets += 1
+        return session
+
+    def expire(self):
+        # run when a new source appears and every EXPIRE_CHECK seconds
+        now = monotonic()
+        self.lastExpire = now
+        for addr in [a for a, s in self.sessions.items() if now - s.lastHeard > SESSION_EXPIRE and s is not self.active]:
+            self.onExpire(self.sessions.pop(addr))
+
+    def busy(self, session):
+        # True if another source currently holds the floor
+        active = self.active
+        return active is not None and active is not session and monotonic() - active.lastVoice < self.holdTime
+
+    def claim(self, session, keyup):
+        # voice packet from session - True if it may be played.
+        # Only a keyed packet can take the floor from an idle or silent source.
+        if session is not self.active and (not keyup or self.busy(session)):
+            session.dropped += 1
+            return False
+        self.take(session)
+        return True
+
+    def take(self, session):
+        # session holds the floor from now
+        if session is not self.active:
+            if self.active is not None:
+                self.switches += 1
+                ut.log.debug('Active rx source {} > {}'.format(self.active.addr, session.addr))
+            self.active = session
+        session.lastVoice = monotonic()
+
+    def summary(self):
+        return 'sources {} switches {}: '.format(len(self.sessions), self.switches) + \
+            ', '.join(s.summary() for s in self.sessions.values())
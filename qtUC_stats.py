@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC rx statistics
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+from time import perf_counter
+from qtUC_jitter import FRAME_TIME, seqDiff
+
+SEQ_WINDOW = 64                                     # duplicate detection window (packets)
+SEQ_MASK = (1 << SEQ_WINDOW) - 1
+SEQ_RESTART = 1000                                  # a jump this big either way is a new stream (AB restart), not loss
+
+
+class callStats():
+    # Per call packet accounting from the USRP sequence numbers.
+    # update() is O(1) per packet, duplicates are tracked with a bit mask
+    # of the last SEQ_WINDOW sequence numbers below the highest seen, and
+    # update() returns False for a duplicate.
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.received = 0                           # unique frames received
+        self.duplicates = 0
+        self.reordered = 0                          # arrived after a later frame
+        self.restarts = 0                           # sequence jumps treated as a new stream
+        self.highest = None                         # highest seq seen
+        self.extHighest = 0                         # highest seq relative to the first, wrap safe
+        self.extLowest = 0                          # lowest seq relative to the first
+        self.seen = 0                               # bit n set = highest - n received
+        self.jitter = 0.0                           # RFC3550 interarrival jitter (seconds)
+        self.lastArrival = None
+        self.lastSeq = None
+
+    def update(self, seq, arrival=None):
+        if arrival is None:
+            arrival = perf_counter()
+
+        if self.highest is None:                    # first frame of the call
+            self.highest = seq
+            self.seen = 1
+            self.received = 1
+        else:
+            d = seqDiff(seq, self.highest)
+            if abs(d) >= SEQ_RESTART:               # sender restarted, carry on from here
+                self.restarts += 1
+                self.highest = seq
+                self.seen = 1
+                self.extHighest += 1                # counted as the next frame, no loss
+                self.received += 1
+                self.lastArrival = None             # no jitter sample across the jump
+            elif d > 0:                             # in order (possibly after a gap)
+                self.seen = ((self.seen << d) | 1) & SEQ_MASK if d < SEQ_WINDOW else 1
+                self.highest = seq
+                self.extHighest += d
+                self.received += 1
+            elif d == 0 or (-d < SEQ_WINDOW and self.seen & (1 << -d)):
+                self.duplicates += 1
+                return False
+            else:                                   # late, fills an earlier gap
+                if -d < SEQ_WINDOW:
+                    self.seen |= 1 << -d
+                self.extLowest = min(self.extLowest, self.extHighest + d)
+                self.reordered += 1
+                self.received += 1
+
+        # D(i,j) = (Rj - Ri) - (Sj - Si), sender clock is one frame per seq
+        if self.lastArrival is not None:
+            d = (arrival - self.lastArrival) - seqDiff(seq, self.lastSeq) * FRAME_TIME
+            self.jitter += (abs(d) - self.jitter) / 16
+        self.lastArrival = arrival
+        self.lastSeq = seq
+        return True
+
+    def expected(self):
+        return 0 if self.highest is None else self.extHighest - self.extLowest + 1
+
+    def lost(self):
+        return max(0, self.expected() - self.received)
+
+    def lossPercent(self):
+        expected = self.expected()
+        return (100.0 * self.lost() / expected) if expected else 0.0
+
+    def lossText(self):
+        return '{:.2f}%'.format(self.lossPercent())
+
+    def summary(self):
+        return 'expected {} received {} lost {} ({}) dup {} reorder {} restart {} jitter {:.1f}ms'.format(
+            self.expected(), self.received, self.lost(), self.lossText(),
+            self.duplicates, self.reordered, self.restarts, self.jitter * 1000)
+
+
+class batchStats():
+    # Datagrams drained per rx wakeup
+    BUCKETS = (1, 2, 4, 8, 16, 32)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.wakeups = 0
+        self.packets = 0
+        self.largest = 0
+        self.histogram = dict.fromkeys(self.BUCKETS, 0)     # upper bound: count
+
+    def update(self, size):
+        self.wakeups += 1
+        self.packets += size
+        self.largest = max(self.largest, size)
+        for bound in self.BUCKETS:
+            if size <= bound:
+                self.histogram[bound] += 1
+                break
+
+    def summary(self):
+        avg = (self.packets / self.wakeups) if self.wakeups else 0.0
+        return 'wakeups {} packets {} avg {:.2f} max {} hist {}'.format(
+            self.wakeups, self.packets, avg, self.largest, self.histogram)
@@ -24,14 +24,16 @@
 # --------------------------------------------------------------------------- #
 import threading
 import sys
-from math import log10
-import struct
 import pyaudio
-import audioop
-import qtUC_const as const
 import qtUC_defs as defs
 from qtUC_vars import qtUCVars as cfg               # configuration variables
 import qtUC_util as ut
+from qtUC_resample import polyResampler
+from qtUC_dsp import levelMeter, txChain, highPass, gainStage, compressor, limiter
+from qtUC_codec import voiceCodec
+from qtUC_audio import callbackInput
+from qtUC_usrp import usrpEncoder
+from qtUC_vox import voxDetector
 
 
 class qtUcTx(threading.Thread):
@@ -48,11 +50,12 @@ class qtUcTx(threading.Thread):
         self.inIndex = cfg.in_index                 # audio input (mic) device index
         self.portName = ''
         self.format = pyaudio.paInt16
-        self.chunk = 160 if cfg.SAMPLE_RATE == 8000 else (160 * 6)     # Size of chunk to read
+        self.chunk = cfg.SAMPLE_RATE // 50          # Size of chunk to read (20ms)
         self.channels = 1
         self.rate = cfg.SAMPLE_RATE
 
         self.stream = None                          # input audio stream
+        self.resampler = polyResampler(self.rate, 8000) if self.rate != 8000 else None      # device rate > 8K
 
         # external handlers
         self.onSendUDP = self.nullHandler
@@ -62,18 +65,30 @@ class qtUcTx(threading.Thread):
 
         # runtime
         self.enableVox = cfg.vox_enable             # default vox
-        self.vox_decay = -1                         # vox decay
+        self.vox = voxDetector(cfg.vox_threshold, cfg.vox_close, cfg.vox_delay, cfg.vox_preroll)
         self.transmit_enable = False                # allow transmit - assume no until setup
         self.lastptt = False                        # previous ptt state
         self.ptt = False                            # Current ptt state
         self.usrpSeq = 0                            # Each USRP packet has a unique sequence number
-        self.txLevelAvg = 0
+        self.frame = usrpEncoder()                  # reused voice packet buffer
+        self.codec = voiceCodec(cfg.voice_codec)    # voice payload format sent to AB
+        self.meter = levelMeter(cfg.meter_rate, cfg.meter_offset, cfg.meter_hold)
+        self.meter.onLevel = lambda level, peak: self.onTxLevel(level, peak)
+        self.micGain = gainStage(cfg.mic_vol)
+        self.dsp = txChain([highPass(cfg.tx_hpf),   # mic processing before packetisation
+                            self.micGain,
+                            compressor(cfg.tx_comp_threshold, cfg.tx_comp_ratio),
+                            limiter(cfg.tx_limit)], cfg.tx_dsp_budget)
+        self.dsp.enable(cfg.tx_dsp)
 
         self.openAudioInput()
 
     def shutdown(self):
         ut.log.debug('tx - ' + defs.STRING_EXITING)
         self.quit = True
+        if isinstance(self.stream, callbackInput):
+            ut.log.info('tx input: {}'.format(self.inputStats()))
+        ut.log.info('tx dsp: ' + self.dsp.summary())
 
     def openAudioInput(self):
         if self.inIndex < 0:                        # no audio input
@@ -98,15 +113,18 @@ class qtUcTx(threading.Thread):
 
         #  open the input
         try:
-            self.stream = self.pya.open(
-                format=self.format,
-                channels=self.channels,
-                rate=self.rate,
-                input=True,
-                # output=False,
-                frames_per_buffer=self.chunk,
-                input_device_index=self.inIndex
-            )
+            if cfg.input_callback:                  # device fills a ring buffer, frames are pulled from it
+                self.stream = callbackInput(self.pya, self.channels, self.rate, self.chunk, self.inIndex)
+            else:
+                self.stream = self.pya.open(
+                    format=self.format,
+                    channels=self.channels,
+                    rate=self.rate,
+                    input=True,
+                    # output=False,
+                    frames_per_buffer=self.chunk,
+                    input_device_index=self.inIndex
+                )
         except Exception as e:
             errmsg = defs.STRING_FATAL_INPUT_STREAM + str(sys.exc_info()[1])
             # print(' tx audio barf ', str(e), errmsg)
@@ -151,8 +169,6 @@ class qtUcTx(threading.Thread):
 
     # TX thread, send audio to AB
     def run(self):
-        state = None
-
         ut.log.info('Starting tx audio thread')
         self.lastPtt = self.ptt
         if not self.connected:                      # we have input capability
@@ -169,51 +185,77 @@ class qtUcTx(threading.Thread):
                     # print('checking pause')
                     if self.paused:
                         # print('paused')
+                        self.captureStandby()
                         self.pause_cond.wait()          # Block execution until notified.
+                        self.captureResume()            # ptt - start from fresh audio
 
             # good to go...
             try:
                 # print('sampling...')
-                if self.rate == 48000:                  # If we are reading at 48K we need to resample to 8K
-                    audio48 = self.stream.read(self.chunk, exception_on_overflow=False)
-                    (self.audio, state) = audioop.ratecv(audio48, 2, 1, 48000, 8000, state)
+                if self.resampler is not None:          # If we are not reading at 8K we need to resample to 8K
+                    audioIn = self.stream.read(self.chunk, exception_on_overflow=False)
+                    self.audio = self.resampler.convert(audioIn)
                 else:
                     self.audio = self.stream.read(self.chunk, exception_on_overflow=False)
 
-                # print('chunk...')
-                rms = audioop.rms(self.audio, 2)        # Get a relative power value for the sample
-
                 # -- Vox processing -- #
+                lead = ()
                 if self.enableVox:
                     # print('vox check')
-                    if rms > cfg.vox_threshold:                     # is it loud enough?
-                        self.vox_decay = cfg.vox_delay              # Yes, reset the decay value (wont unkey for N samples)
+                    self.vox.setLevels(cfg.vox_threshold, cfg.vox_close, cfg.vox_delay)     # may be changed in settings
+                    if self.vox.update(self.audio):                 # voice (or still in the hang time)
                         if not self.ptt and self.transmit_enable:   # Are we changing ptt state to True?
                             self.ptt = True                         # Set it
+                            lead = self.vox.takeLead()              # audio from just before the key up
                             self.onVoxPtt(True)                     # Update the UI (turn transmit button red, etc)
-                    elif self.ptt:                                  # Are we too soft and transmitting?
-                        self.vox_decay -= 1                         # Decrement the decay counter
-                        if self.vox_decay <= 0:                     # Have we passed N samples, all of them less then the threshold?
-                            self.ptt = False                        # Unkey
-                            self.onVoxPtt(False)                    # Update the UI
+                        elif not self.ptt:
+                            self.vox.keepLead(self.audio)           # tx not allowed yet, keep the pre-roll for when it is
+                    elif self.ptt:                                  # hang time over, unkey
+                        self.ptt = False
+                        self.onVoxPtt(False)                        # Update the UI
                 # -------------------- #
 
                 # change of state Tx > idle or Idle > Tx (Vox)
                 if self.ptt or (self.ptt != self.lastPtt):
                     # print('sending...', self.audio)
-                    bUsrp = 'USRP'.encode('ASCII') + struct.pack('>iiiiiii',
-                                                                 self.usrpSeq,
-                                                                 0, self.ptt, 0,
-                                                                 const.USRP_TYPE_VOICE, 0, 0) + self.audio
-                    self.sendto(bUsrp)
+                    self.micGain.setVolume(cfg.mic_vol)         # may be changed in settings
+                    if self.ptt and not self.lastPtt:
+                        self.codec.reset()              # adpcm state starts fresh each call
+                        self.dsp.enable(cfg.tx_dsp)     # may be changed in settings
+                        self.dsp.reset()
+                        for frame in lead:              # vox pre-roll, so the first syllable isn't clipped
+                            self.sendto(self.voicePacket(self.dsp.process(frame)))
+                            self.usrpSeq += 1
+                    self.audio = self.dsp.process(self.audio)   # filter, gain, compress and limit
+                    self.sendto(self.voicePacket(self.audio))
                     self.usrpSeq += 1
-                self.lastPtt = self.ptt
                 if self.ptt:
-                    self.txLevel(rms)
+                    self.meter.feed(self.audio)
+                elif self.lastPtt:                      # unkeyed, drop the meter
+                    self.meter.reset()
+                    self.onTxLevel(0)
+                self.lastPtt = self.ptt
 
             except Exception:
                 ut.log.warning("TX thread:" + str(sys.exc_info()[1]))
 
+    def captureStandby(self):
+        if isinstance(self.stream, callbackInput):
+            self.stream.standby()
+
+    def captureResume(self):
+        if isinstance(self.stream, callbackInput):
+            self.stream.resume()
+
+    def inputStats(self):
+        # capture overflow counters (callback input only)
+        return self.stream.stats() if isinstance(self.stream, callbackInput) else {}
+
+    def voicePacket(self, audio):
+        # USRP voice packet for one 20ms 8K frame in the negotiated format,
+        # a view of the reused packet buffer that is sent before the next frame
+        return self.frame.encode(self.usrpSeq, self.ptt, self.codec.type, self.codec.encode(audio))
+
     def voxState(self, state):
         # enable/disable vox
         currentState = self.enableVox
@@ -222,20 +264,3 @@ class qtUcTx(threading.Thread):
             self.pause()                            # back to ptt mode
         else:
             self.resume()                           # vox mode
-
-    def txLevel(self, level):
-        # smooth out rx levels
-        lvl = int(level / 100)
-        avg = int((lvl + self.txLevelAvg) / 2)
-        if avg > self.txLevelAvg:
-            self.txLevelAvg = avg
-
-        if self.txLevelAvg >= 0:
-            if self.txLevelAvg > 0:
-                lvDB = int(20 * log10(self.txLevelAvg))
-            else:
-                lvDB = 0
-            # if lvDB > self.rxMax:
-            #     self.rxMax = lvDB
-            self.onTxLevel(lvDB)
-            self.txLevelAvg -= 2
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC USRP packet framing
+# Based on the original pyUC code, modified for QT5 use
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# pyUC ("puck")
+# Copyright (C) 2014, 2015, 2016, 2019, 2020, 2021 N4IRR
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import struct
+from time import perf_counter
+
+# USRP header layout (32 bytes)
+#   eye[4] seq memory keyup talkgroup type mpxid reserved
+# All fields are big endian except 'type', which AB writes in the first byte
+# of the word (pyUC unpacked it native), so it is read as a byte + 3 pad bytes.
+# The eye is skipped here and checked in place against the buffer.
+USRP_HEADER = struct.Struct('>4x4iB3x2i')
+USRP_FIELDS = struct.Struct('>4iB3x2i')         # the header after the eye, for building packets
+USRP_HEADER_SIZE = USRP_HEADER.size             # 32
+USRP_MAX_PACKET = 1024                          # largest datagram we expect from AB
+USRP_EYE = b'USRP'
+
+
+class usrpDecoder():
+    # Decode USRP datagrams received into a reused buffer.
+    # The payload is returned as a memoryview into the receive buffer, it is
+    # only valid until the next datagram is received into the same buffer.
+    def __init__(self, size=USRP_MAX_PACKET):
+        self.buf = bytearray(size)                  # receive buffer, filled by recv(from)_into
+        self.view = memoryview(self.buf)
+        self.nbytes = 0                             # length of the current datagram
+
+        # decoded header fields of the current packet
+        self.seq = 0
+        self.memory = 0
+        self.keyup = 0
+        self.talkgroup = 0
+        self.type = -1
+        self.mpxid = 0
+        self.reserved = 0
+
+    def recvfrom(self, sock, flags=0):
+        # receive a datagram directly into the buffer
+        self.nbytes, addr = sock.recvfrom_into(self.buf, 0, flags)
+        return addr
+
+    def load(self, data):
+        # copy an externally supplied datagram into the buffer (replay, tests etc)
+        self.nbytes = min(len(data), len(self.buf))
+        self.buf[:self.nbytes] = data[:self.nbytes]
+
+    def decode(self):
+        # decode the header of the current datagram, False if it is not a USRP packet
+        if self.nbytes < USRP_HEADER_SIZE or not self.buf.startswith(USRP_EYE):
+            return False
+
+        (self.seq, self.memory, self.keyup, self.talkgroup,
+         self.type, self.mpxid, self.reserved) = USRP_HEADER.unpack_from(self.buf)
+        return True
+
+    def payload(self):
+        # zero copy view of the packet payload
+        return self.view[USRP_HEADER_SIZE:self.nbytes]
+
+
+class usrpEncoder():
+    # Builds USRP packets in a reused buffer, one encoder per sending stream.
+    # The eye is written once, each packet packs the header fields in place
+    # and copies the payload after them. The packet is returned as a
+    # memoryview, only valid until the next encode().
+    def __init__(self, size=USRP_MAX_PACKET):
+        self.allocate(size)
+
+    def allocate(self, size):
+        self.buf = bytearray(size)
+        self.buf[:4] = USRP_EYE
+        self.view = memoryview(self.buf)
+        self.views = {}                             # packet length: view, voice packets are all one size
+        self.pack = USRP_FIELDS.pack_into
+
+    def encode(self, seq, keyup, ptype, payload=b''):
+        n = USRP_HEADER_SIZE + len(payload)
+        view = self.views.get(n)
+        if view is None:
+            if n > len(self.buf):
+                self.allocate(n)
+            view = self.views[n] = self.view[:n]
+        self.pack(self.buf, 4, seq, 0, keyup, 0, ptype, 0, 0)
+        self.buf[USRP_HEADER_SIZE:n] = payload
+        return view
+
+
+class usrpDispatcher():
+    # Routes packets to handlers registered per USRP packet type and per TLV
+    # tag with a single dict lookup, counting and timing each type/tag.
+    # Each entry is [handler, count, seconds] so no key is built per packet.
+    def __init__(self):
+        self.handlers = {}                          # packet type: entry
+        self.tlvHandlers = {}                       # tlv tag: entry
+        self.unknown = 0
+
+    def register(self, ptype, handler):
+        self.handlers[ptype] = [handler, 0, 0.0]
+
+    def registerTLV(self, tag, handler):
+        self.tlvHandlers[tag] = [handler, 0, 0.0]
+
+    def dispatch(self, ptype):
+        return self.run(self.handlers.get(ptype))
+
+    def dispatchTLV(self, tag):
+        return self.run(self.tlvHandlers.get(tag))
+
+    def run(self, entry):
+        if entry is None:
+            self.unknown += 1
+            return False
+
+        start = perf_counter()
+        entry[0]()
+        entry[2] += perf_counter() - start
+        entry[1] += 1
+        return True
+
+    def summary(self):
+        stats = []
+        for name, table in (('type', self.handlers), ('tlv', self.tlvHandlers)):
+            for key, (handler, cnt, secs) in table.items():
+                if cnt:
+                    stats.append('{} {} {} ({:.1f}us avg)'.format(name, key, cnt, 1e6 * secs / cnt))
+        return ', '.join(stats + ['unknown {}'.format(self.unknown)])
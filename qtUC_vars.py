@@ -64,11 +64,19 @@ class qtUCVars():
 
     loopback = False                        # NOT USED?
     dongle_mode = False                     # NOT USED?
-    mic_vol = 50                            # NOT USED?
-    sp_vol = 50                             # NOT USED?
+    mic_vol = 50                            # tx mic gain 0..100, 50 = unity
+    sp_vol = 50                             # rx speaker volume 0..100, 50 = unity
     vox_enable = False
     vox_threshold = 200
     vox_delay = 50
+    vox_close = 150                         # vox closes (after vox_delay frames) below this level, <= vox_threshold
+    vox_preroll = 0.2                       # seconds of audio before the vox opened sent on key up
+    tx_dsp = 'hpf,gain,comp,limit'          # tx processing stages in use ('' = raw mic audio)
+    tx_hpf = 150.0                          # tx high pass cutoff (Hz)
+    tx_comp_threshold = -24.0               # tx compressor threshold (dBFS rms)
+    tx_comp_ratio = 3.0                     # tx compressor ratio
+    tx_limit = -1.0                         # tx limiter ceiling (dBFS)
+    tx_dsp_budget = 0.002                   # cpu seconds per 20ms frame the tx processing should stay under
     slot = 2
     asl_mode = 0
 
@@ -94,8 +102,43 @@ class qtUCVars():
     # servers = sorted(talk_groups.keys())
     # connected_msg = defs.STRING_CONNECTED_TO
 
-    level_every_sample = 1
     NAT_ping_timer = 0
+    async_net = False                       # asyncio network core instead of rx/keepalive threads
+    reg_retry = 10                          # asyncio: seconds between registration retries (0 = off)
+    info_poll = 0                           # asyncio: seconds between INFO requests (0 = off)
+    voice_codec = 'pcm'                     # tx voice payload asked of AB: pcm, ulaw or adpcm
+    session_hold = 0.5                      # seconds the active rx source keeps the floor after its last voice
+    eot_timeout = 0.5                       # seconds without rx voice before a call is ended (missed EOT), 0 = off
+    rx_mix = False                          # mix all rx sources instead of following one talker
+    mix_gain = 1.0                          # gain applied to each source when mixing
+    mix_source_gain = ''                    # per source mixing gains, 'ip:port=gain, ip=gain'
+
+    # rx audio pipeline
+    jitter_buffer = False                   # play rx audio through the adaptive jitter buffer
+    jitter_min = 2                          # minimum jitter buffer depth (20 ms frames)
+    jitter_max = 10                         # maximum jitter buffer depth (20 ms frames)
+    audio_callback = False                  # non blocking (callback) audio output
+    input_callback = True                   # callback audio capture into a ring buffer
+    rx_batch = 0                            # max datagrams drained per rx wakeup (0/1 = one at a time)
+    xfer_dir = ''                           # where files pushed by AB are saved ('' = Documents/qtUC/files)
+    silence_level = 8                       # rx frames peaking at or below this (lsb) skip the resampler, -1 = off
+    comfort_noise = 0                       # comfort noise level for skipped frames (dBFS), 0 = digital silence
+    channel_map = ''                        # output channels that get rx audio, e.g. '0' = left only ('' = all)
+    rx_agc = True                           # normalise the received level
+    agc_target = -18.0                      # rx agc target level (dBFS rms)
+    agc_max_gain = 20.0                     # most the rx agc will boost or cut (dB)
+    agc_attack = 0.02                       # rx agc gain reduction time constant (seconds)
+    agc_release = 0.5                       # rx agc gain recovery time constant (seconds)
+    record_calls = False                    # save each received call to a WAV file
+    record_dir = ''                         # where calls are recorded ('' = Documents/qtUC/recordings)
+    record_queue = 500                      # frames the recorder may fall behind before dropping
+    capture_file = ''                       # capture raw rx datagrams for qtUC_capture.py replay ('' = off)
+    tx_connect = True                       # connected socket per tx port (when rx has its own port)
+
+    # level meter
+    meter_rate = 25                         # meter updates per second
+    meter_offset = 50.0                     # dB added to dBFS for the 0-55 meter scale
+    meter_hold = 0.5                        # peak hold time (seconds)
 
     def __init__(self):
         pass
@@ -169,8 +212,19 @@ class qtUCVars():
 
             # defaults
             self.useQRZ = config.getboolean('DEFAULTS', 'useQRZ', fallback=True)
-            self.level_every_sample = int(config.get('DEFAULTS', 'levelEverySample', fallback='2'))
             self.NAT_ping_timer = int(config.get('DEFAULTS', 'pingTimer', fallback='0'))
+            self.async_net = config.getboolean('DEFAULTS', 'asyncNet', fallback=False)
+            self.reg_retry = int(config.get('DEFAULTS', 'regRetry', fallback='10').split(None)[0])
+            self.info_poll = int(config.get('DEFAULTS', 'infoPoll', fallback='0').split(None)[0])
+            self.voice_codec = config.get('DEFAULTS', 'voiceCodec', fallback='pcm').split(None)[0].lower()
+            if self.voice_codec not in ('pcm', 'ulaw', 'adpcm'):
+                ut.log.warning('Unknown voiceCodec ' + self.voice_codec + ', using pcm')
+                self.voice_codec = 'pcm'
+            self.session_hold = float(config.get('DEFAULTS', 'sessionHold', fallback='0.5').split(None)[0])
+            self.eot_timeout = float(config.get('DEFAULTS', 'eotTimeout', fallback='0.5').split(None)[0])
+            self.rx_mix = config.getboolean('DEFAULTS', 'rxMix', fallback=False)
+            self.mix_gain = float(config.get('DEFAULTS', 'mixGain', fallback='1.0').split(None)[0])
+            self.mix_source_gain = config.get('DEFAULTS', 'mixSourceGain', fallback='').strip()
             # self.loopback = bool(config.get('DEFAULTS', 'loopback', fallback=False).split(None)[0])
             # self.dongle_mode = bool(config.get('DEFAULTS', 'dongleMode', fallback=False).split(None)[0])
             self.vox_enable = config.getboolean('DEFAULTS', 'voxEnable', fallback=False)   # .split(None)[0]
@@ -178,9 +232,44 @@ class qtUCVars():
             self.sp_vol = int(config.get('DEFAULTS', 'spVol', fallback='50').split(None)[0])
             self.vox_threshold = int(config.get('DEFAULTS', 'voxThreshold', fallback='200').split(None)[0])
             self.vox_delay = int(config.get('DEFAULTS', 'voxDelay', fallback='50').split(None)[0])
+            self.vox_close = int(config.get('DEFAULTS', 'voxClose', fallback='150').split(None)[0])
+            self.vox_preroll = float(config.get('DEFAULTS', 'voxPreroll', fallback='0.2').split(None)[0])
+            self.tx_dsp = config.get('DEFAULTS', 'txDsp', fallback='hpf,gain,comp,limit').strip()
+            self.tx_hpf = float(config.get('DEFAULTS', 'txHpf', fallback='150').split(None)[0])
+            self.tx_comp_threshold = float(config.get('DEFAULTS', 'txCompThreshold', fallback='-24').split(None)[0])
+            self.tx_comp_ratio = float(config.get('DEFAULTS', 'txCompRatio', fallback='3').split(None)[0])
+            self.tx_limit = float(config.get('DEFAULTS', 'txLimit', fallback='-1').split(None)[0])
+            self.tx_dsp_budget = float(config.get('DEFAULTS', 'txDspBudget', fallback='0.002').split(None)[0])
             self.slot = int(config.get('DEFAULTS', 'slot', fallback='2').split(None)[0])
             self.asl_mode = int(config.get('DEFAULTS', 'aslMode', fallback='0').split(None)[0])
 
+            # rx audio pipeline
+            self.jitter_buffer = config.getboolean('DEFAULTS', 'jitterBuffer', fallback=False)
+            self.jitter_min = max(1, int(config.get('DEFAULTS', 'jitterMin', fallback='2').split(None)[0]))
+            self.jitter_max = int(config.get('DEFAULTS', 'jitterMax', fallback='10').split(None)[0])
+            self.audio_callback = config.getboolean('DEFAULTS', 'audioCallback', fallback=False)
+            self.input_callback = config.getboolean('DEFAULTS', 'inputCallback', fallback=True)
+            self.rx_batch = int(config.get('DEFAULTS', 'rxBatch', fallback='0').split(None)[0])
+            self.xfer_dir = config.get('DEFAULTS', 'xferDir', fallback='').strip().strip("'\"")
+            self.silence_level = int(config.get('DEFAULTS', 'silenceLevel', fallback='8').split(None)[0])
+            self.comfort_noise = float(config.get('DEFAULTS', 'comfortNoise', fallback='0').split(None)[0])
+            self.channel_map = config.get('DEFAULTS', 'channelMap', fallback='').strip()
+            self.rx_agc = config.getboolean('DEFAULTS', 'rxAgc', fallback=True)
+            self.agc_target = float(config.get('DEFAULTS', 'agcTarget', fallback='-18').split(None)[0])
+            self.agc_max_gain = float(config.get('DEFAULTS', 'agcMaxGain', fallback='20').split(None)[0])
+            self.agc_attack = float(config.get('DEFAULTS', 'agcAttack', fallback='0.02').split(None)[0])
+            self.agc_release = float(config.get('DEFAULTS', 'agcRelease', fallback='0.5').split(None)[0])
+            self.record_calls = config.getboolean('DEFAULTS', 'recordCalls', fallback=False)
+            self.record_dir = config.get('DEFAULTS', 'recordDir', fallback='').strip().strip("'\"")
+            self.record_queue = int(config.get('DEFAULTS', 'recordQueue', fallback='500').split(None)[0])
+            self.capture_file = config.get('DEFAULTS', 'captureFile', fallback='').strip().strip("'\"")
+            self.tx_connect = config.getboolean('DEFAULTS', 'txConnect', fallback=True)
+
+            # level meter
+            self.meter_rate = int(config.get('DEFAULTS', 'meterRate', fallback='25').split(None)[0])
+            self.meter_offset = float(config.get('DEFAULTS', 'meterOffset', fallback='50').split(None)[0])
+            self.meter_hold = float(config.get('DEFAULTS', 'meterHold', fallback='0.5').split(None)[0])
+
             # Audio devices
             in_index = config.get('DEFAULTS', 'in_index', fallback='default')
             if in_index.lower() == 'default':
@@ -235,8 +324,16 @@ class qtUCVars():
 
         # defaults
         config.set('DEFAULTS', 'useQRZ', self.useQRZ)
-        config.set('DEFAULTS', 'levelEverySample', str(self.level_every_sample))
         config.set('DEFAULTS', 'pingTimer', str(self.NAT_ping_timer))
+        config.set('DEFAULTS', 'asyncNet', str(self.async_net))
+        config.set('DEFAULTS', 'regRetry', str(self.reg_retry))
+        config.set('DEFAULTS', 'infoPoll', str(self.info_poll))
+        config.set('DEFAULTS', 'voiceCodec', self.voice_codec)
+        config.set('DEFAULTS', 'sessionHold', str(self.session_hold))
+        config.set('DEFAULTS', 'eotTimeout', str(self.eot_timeout))
+        config.set('DEFAULTS', 'rxMix', str(self.rx_mix))
+        config.set('DEFAULTS', 'mixGain', str(self.mix_gain))
+        config.set('DEFAULTS', 'mixSourceGain', self.mix_source_gain)
         config.set('DEFAULTS', 'loopback', self.loopback)
         config.set('DEFAULTS', 'dongleMode', self.dongle_mode)
         config.set('DEFAULTS', 'voxEnable', self.vox_enable)
@@ -244,9 +341,42 @@ class qtUCVars():
         config.set('DEFAULTS', 'spVol', str(self.sp_vol))
         config.set('DEFAULTS', 'voxThreshold', str(self.vox_threshold))
         config.set('DEFAULTS', 'voxDelay', str(self.vox_delay))
+        config.set('DEFAULTS', 'voxClose', str(self.vox_close))
+        config.set('DEFAULTS', 'voxPreroll', str(self.vox_preroll))
+        config.set('DEFAULTS', 'txDsp', self.tx_dsp)
+        config.set('DEFAULTS', 'txHpf', str(self.tx_hpf))
+        config.set('DEFAULTS', 'txCompThreshold', str(self.tx_comp_threshold))
+        config.set('DEFAULTS', 'txCompRatio', str(self.tx_comp_ratio))
+        config.set('DEFAULTS', 'txLimit', str(self.tx_limit))
+        config.set('DEFAULTS', 'txDspBudget', str(self.tx_dsp_budget))
         config.set('DEFAULTS', 'slot', str(self.slot))
         config.set('DEFAULTS', 'aslMode', str(self.asl_mode))
 
+        # rx audio pipeline
+        config.set('DEFAULTS', 'jitterBuffer', str(self.jitter_buffer))
+        config.set('DEFAULTS', 'jitterMin', str(self.jitter_min))
+        config.set('DEFAULTS', 'jitterMax', str(self.jitter_max))
+        config.set('DEFAULTS', 'audioCallback', str(self.audio_callback))
+        config.set('DEFAULTS', 'inputCallback', str(self.input_callback))
+        config.set('DEFAULTS', 'rxBatch', str(self.rx_batch))
+        config.set('DEFAULTS', 'xferDir', self.xfer_dir)
+        config.set('DEFAULTS', 'silenceLevel', str(self.silence_level))
+        config.set('DEFAULTS', 'comfortNoise', str(self.comfort_noise))
+        config.set('DEFAULTS', 'channelMap', self.channel_map)
+        config.set('DEFAULTS', 'rxAgc', str(self.rx_agc))
+        config.set('DEFAULTS', 'agcTarget', str(self.agc_target))
+        config.set('DEFAULTS', 'agcMaxGain', str(self.agc_max_gain))
+        config.set('DEFAULTS', 'agcAttack', str(self.agc_attack))
+        config.set('DEFAULTS', 'agcRelease', str(self.agc_release))
+        config.set('DEFAULTS', 'recordCalls', str(self.record_calls))
+        config.set('DEFAULTS', 'recordDir', self.record_dir)
+        config.set('DEFAULTS', 'recordQueue', str(self.record_queue))
+        config.set('DEFAULTS', 'captureFile', self.capture_file)
+        config.set('DEFAULTS', 'txConnect', str(self.tx_connect))
+        config.set('DEFAULTS', 'meterRate', str(self.meter_rate))
+        config.set('DEFAULTS', 'meterOffset', str(self.meter_offset))
+        config.set('DEFAULTS', 'meterHold', str(self.meter_hold))
+
         # Audio devices
         config.set('DEFAULTS', 'in_index', str(self.in_index))
         config.set('DEFAULTS', 'out_index', str(self.out_index))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC voice operated transmit
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+from collections import deque
+import numpy as np
+
+SUB_FRAMES = 4                                      # 5ms energy windows per 20ms frame
+VOX_ATTACK = 2                                      # loud windows in a frame needed to open
+FRAME_TIME = 0.020
+
+
+class voxDetector():
+    # Voice detection on 20ms 8K frames with separate open and close levels.
+    # Each frame is split into sub-frame windows and their RMS computed in
+    # one go. The vox opens when VOX_ATTACK windows reach openLevel (a single
+    # click doesn't key) and closes after hangFrames frames with every window
+    # below closeLevel. Frames heard while closed are kept in a pre-roll ring
+    # that takeLead() hands over on key up, so the start of the first
+    # syllable is sent. If tx can't key yet, keepLead() keeps the ring
+    # current with the frames not sent until it can.
+    def __init__(self, openLevel=200, closeLevel=150, hangFrames=50, preRoll=0.2):
+        self.setLevels(openLevel, closeLevel, hangFrames)
+        self.ring = deque(maxlen=max(0, int(round(preRoll / FRAME_TIME))))     # recent frames not sent
+        self.open = False
+        self.hang = 0                               # frames left before closing
+
+        # stats
+        self.opens = 0
+
+    def setLevels(self, openLevel, closeLevel, hangFrames):
+        self.openLevel = openLevel
+        self.closeLevel = min(closeLevel, openLevel)
+        self.hangFrames = hangFrames
+
+    def levels(self, audio):
+        # RMS of each sub-frame window
+        x = np.frombuffer(audio, dtype='<i2')
+        if len(x) % SUB_FRAMES:
+            x = x[:len(x) - len(x) % SUB_FRAMES]
+        w = x.reshape(SUB_FRAMES, -1).astype(np.float32)
+        return np.sqrt(np.einsum('ij,ij->i', w, w) / w.shape[1])
+
+    def update(self, audio):
+        # feed one frame, True while voice is present (including the hang time)
+        rms = self.levels(audio)
+        if not self.open:
+            if np.count_nonzero(rms >= self.openLevel) >= VOX_ATTACK:
+                self.open = True
+                self.hang = self.hangFrames
+                self.opens += 1
+            else:
+                self.ring.append(audio)             # may be needed as pre-roll
+        elif rms.max() >= self.closeLevel:
+            self.hang = self.hangFrames             # still talking
+        else:
+            self.hang -= 1
+            if self.hang <= 0:
+                self.open = False
+        return self.open
+
+    def takeLead(self):
+        # pre-roll frames for the key up, in order, the ring starts again empty
+        lead = list(self.ring)
+        self.ring.clear()
+        return lead
+
+    def keepLead(self, audio):
+        # open but tx not keyed, the frame becomes pre-roll for a later key up
+        self.ring.append(audio)
+
+    def reset(self):
+        self.open = False
+        self.hang = 0
+        self.ring.clear()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC missed EOT watchdog
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import threading
+from math import ceil
+from time import perf_counter, sleep
+import qtUC_util as ut
+
+TICK = 0.020                                        # wheel resolution, one voice frame
+WHEEL_SLOTS = 64                                    # slots per turn (1.28s)
+
+
+class timerWheel():
+    # Hashed timing wheel of deadlines (in ticks) keyed by any hashable.
+    # A key is filed in exactly one slot while it is in deadlines, touch()
+    # only moves its deadline and the wheel re-files it lazily when the old
+    # slot comes round, so a packet costs a dict store and no timer object.
+    def __init__(self, slots=WHEEL_SLOTS):
+        self.lock = threading.Lock()                # touched by rx, advanced by the watchdog
+        self.slots = [[] for _ in range(slots)]
+        self.deadlines = {}                         # key: tick, None = cancelled but still filed
+        self.now = 0                                # current tick
+
+    def touch(self, key, ticks):
+        # (re)arm key to expire after at least ticks whole ticks, the current one has already started
+        with self.lock:
+            deadline = self.now + ticks + 1
+            if key not in self.deadlines:
+                self.slots[deadline % len(self.slots)].append(key)
+            self.deadlines[key] = deadline
+
+    def cancel(self, key):
+        with self.lock:
+            if key in self.deadlines:
+                self.deadlines[key] = None          # dropped when its slot comes round
+
+    def advance(self):
+        # move on one tick, returns the keys that expired
+        expired = []
+        with self.lock:
+            self.now += 1
+            idx = self.now % len(self.slots)
+            slot = self.slots[idx]
+            self.slots[idx] = []
+            for key in slot:
+                deadline = self.deadlines[key]
+                if deadline is None:
+                    del self.deadlines[key]
+                elif deadline > self.now:
+                    self.slots[deadline % len(self.slots)].append(key)     # touched since, re-file
+                else:
+                    del self.deadlines[key]
+                    expired.append(key)
+        return expired
+
+
+class eotWatchdog(threading.Thread):
+    # Ends rx calls whose unkey frame was lost: a keyed source that sends no
+    # voice for timeout seconds is reported through onExpire.
+    def __init__(self, timeout=0.5):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.quit = False
+        self.ticks = max(1, ceil(timeout / TICK))
+        self.wheel = timerWheel()
+        self.expired = 0
+
+        # external handlers
+        self.onExpire = self.nullHandler            # called with the key, from this thread
+
+    def shutdown(self):
+        self.quit = True
+
+    # Null event handler
+    def nullHandler(self, *args):
+        return
+
+    def touch(self, key):
+        self.wheel.touch(key, self.ticks)
+
+    def cancel(self, key):
+        self.wheel.cancel(key)
+
+    def run(self):
+        ut.log.info('Starting rx EOT watchdog')
+        due = perf_counter()
+        while not self.quit:
+            due += TICK
+            wait = due - perf_counter()
+            if wait > 0:
+                sleep(wait)
+            elif wait < -(TICK * 5):                # stalled, don't expire everything in a burst
+                due = perf_counter()
+            for key in self.wheel.advance():
+                self.expired += 1
+                try:
+                    self.onExpire(key)
+                except Exception as e:
+                    ut.log.warning('rx watchdog: ' + str(e))
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# qtUC TLV file transfer
+# Rowan Deppeler - VK3VW - greythane @ gmail.com
+#
+# This software is for use on amateur radio networks only, it is to be used
+# for educational purposes only. Its use on commercial networks is strictly
+# prohibited.  Permission to use, copy, modify, and/or distribute this software
+# hereby granted, provided that the above copyright notice and this permission
+# notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DVSWITCH DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS.  IN NO EVENT SHALL N4IRR BE LIABLE FOR ANY SPECIAL, DIRECT,
+# INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM
+# LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE
+# OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+#
+# --------------------------------------------------------------------------- #
+import os
+import hashlib
+import tempfile
+from time import perf_counter
+import qtUC_util as ut
+
+# TLV_TAG_FILE_XFER sub commands
+FILE_SUBCOMMAND_NAME = 0
+FILE_SUBCOMMAND_PAYLOAD = 1
+FILE_SUBCOMMAND_WRITE = 2
+FILE_SUBCOMMAND_READ = 3
+FILE_SUBCOMMAND_ERROR = 4
+
+WRITE_BUFFER = 1 << 16                              # file write buffering
+PROGRESS_STEP = 10                                  # log progress every n percent
+
+
+class fileTransfer():
+    # One incoming file, streamed to a temp file in the target directory and
+    # renamed into place once the md5 digest has been verified
+    def __init__(self, destDir, name, length):
+        self.name = os.path.basename(name)          # never write outside destDir
+        self.path = os.path.join(destDir, self.name)
+        self.length = length
+        self.received = 0
+        self.md5 = hashlib.md5()
+        self.start = perf_counter()
+        self.nextProgress = PROGRESS_STEP
+
+        fd, self.tmpPath = tempfile.mkstemp(prefix='.' + self.name + '.', suffix='.part', dir=destDir)
+        self.file = os.fdopen(fd, 'wb', buffering=WRITE_BUFFER)
+
+    def write(self, data):
+        self.file.write(data)
+        self.md5.update(data)
+        self.received += len(data)
+
+    def progress(self):
+        return (100 * self.received // self.length) if self.length > 0 else 0
+
+    def rate(self):
+        # bytes per second so far
+        elapsed = perf_counter() - self.start
+        return self.received / elapsed if elapsed > 0 else 0.0
+
+    def finish(self, digest):
+        # verify, flush to disk and move into place - True if the file was kept
+        ok = self.md5.hexdigest().upper() == digest.upper()
+        if ok:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            os.replace(self.tmpPath, self.path)     # atomic on the same filesystem
+        else:
+            self.abort()
+        return ok
+
+    def abort(self):
+        if not self.file.closed:
+            self.file.close()
+        try:
+            os.remove(self.tmpPath)
+        except OSError:
+            pass
+
+
+class xferManager():
+    # Decodes TLV_TAG_FILE_XFER values and keeps one transfer per source
+    def __init__(self, destDir):
+        self.destDir = destDir
+        self.transfers = {}                         # source: fileTransfer
+
+        # external handlers
+        self.onProgress = self.nullHandler          # (name, percent, bytes/sec)
+        self.onComplete = self.nullHandler          # (name, path, ok)
+
+    # Null event handler
+    def nullHandler(self, *args):
+        return
+
+    def abortAll(self):
+        for xfer in self.transfers.values():
+            xfer.abort()
+        self.transfers.clear()
+
+    def handle(self, source, value, length):
+        # value is the TLV value (sub command first), length the TLV length.
+        # A bad packet or a failed write (disk full etc) aborts that transfer, never rx
+        try:
+            self.command(source, value, length)
+        except Exception as e:
+            ut.log.error('File transfer from {} aborted: {}'.format(source, e))
+            xfer = self.transfers.pop(source, None)
+            if xfer is not None:
+                xfer.abort()
+
+    def command(self, source, value, length):
+        cmd = value[0]
+        if cmd == FILE_SUBCOMMAND_NAME:
+            self.begin(source, value)
+        elif cmd == FILE_SUBCOMMAND_PAYLOAD:
+            self.payload(source, value[1:length])
+        elif cmd == FILE_SUBCOMMAND_WRITE:
+            self.complete(source, bytes(value[1:33]).decode('ASCII'))
+        elif cmd == FILE_SUBCOMMAND_ERROR:
+            ut.log.error('File transfer error from AB')
+            xfer = self.transfers.pop(source, None)
+            if xfer is not None:
+                xfer.abort()
+
+    def begin(self, source, value):
+        file_len = (value[1] << 24) + (value[2] << 16) + (value[3] << 8) + value[4]
+        file_name = bytes(value[5:])
+        zero = file_name.find(0)
+        if zero >= 0:
+            file_name = file_name[:zero]
+        file_name = file_name.decode('ASCII')
+
+        old = self.transfers.pop(source, None)
+        if old is not None:
+            ut.log.warning('File transfer ' + old.name + ' restarted before completion')
+            old.abort()
+        try:
+            os.makedirs(self.destDir, exist_ok=True)
+            self.transfers[source] = fileTransfer(self.destDir, file_name, file_len)
+            ut.log.info('File transfer name: {} ({} bytes)'.format(file_name, file_len))
+        except Exception as e:
+            ut.log.error('File transfer ' + file_name + ' can not be created: ' + str(e))
+
+    def payload(self, source, data):
+        xfer = self.transfers.get(source)
+        if xfer is None:
+            ut.log.debug('File payload without a transfer')
+            return
+        xfer.write(data)
+        if xfer.progress() >= xfer.nextProgress:
+            xfer.nextProgress = xfer.progress() + PROGRESS_STEP
+            ut.log.info('File transfer {}: {}% at {:.1f} KB/s'.format(xfer.name, xfer.progress(), xfer.rate() / 1024))
+            self.onProgress(xfer.name, xfer.progress(), xfer.rate())
+
+    def complete(self, source, digest):
+        xfer = self.transfers.pop(source, None)
+        if xfer is None:
+            ut.log.warning('File write without a transfer')
+            return
+        rate = xfer.rate()
+        try:
+            ok = xfer.finish(digest)
+        except Exception as e:
+            ut.log.error('File transfer ' + xfer.name + ' failed: ' + str(e))
+            xfer.abort()
+            ok = False
+
+        if ok:
+            ut.log.info('File {} received, {} bytes at {:.1f} KB/s'.format(xfer.path, xfer.received, rate / 1024))
+        else:
+            ut.log.info('File digest does not match {} vs {}'.format(xfer.md5.hexdigest().upper(), digest))
+        self.onComplete(xfer.name, xfer.path, ok)